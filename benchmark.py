@@ -0,0 +1,162 @@
+import argparse
+import collections
+import math
+import random
+import sys
+import time
+
+from zip_sim import LIDAR_MAX_DISTANCE, TREE_X_BOUNDS, WORLD_WIDTH, Simulation, Tree, generate_world
+
+# Densities flown by default, as the number of trees in the world, from a typical world up to a dense forest
+DEFAULT_TREES = [20, 100, 1000, 10000, 30000]
+# The trees added far from the zip by default, to check that the hot paths don't pay for trees they can't reach, and
+# the number of trees the zip flies among meanwhile
+DEFAULT_FAR_TREES = [0, 10000, 30000]
+DEFAULT_NEAR_TREES = 1000
+# How much worse than linear in the local density the cost of a hot path may grow from one density to the next before
+# the benchmark fails. Timings are noisy, and the fixed cost of a tick weighs more in sparse worlds.
+DEFAULT_SLACK = 2.0
+
+# The zip only flies up to this x, going back to the start of the world once it's past it. Far trees are only placed
+# beyond FAR_X_MIN, out of reach of both the lidar and the collision checks from anywhere the zip goes.
+FLIGHT_MAX_X = 700.0
+FAR_X_MIN = 1000.0
+
+# What measure() found for one world. The circle counts are the local density each hot path sees, on average: the lidar
+# objects within lidar range ahead of the zip, and the trees close enough in x to need the exact collision test.
+Measurement = collections.namedtuple("Measurement", ["num_trees", "far_trees", "ticks_per_sec", "lidar_us",
+                                                     "collision_us", "lidar_circles", "collision_circles"])
+
+
+def fly_straight(sim, ticks):
+    """ Steps the simulation ticks times with the zip flying straight ahead, and returns the seconds it took and the
+    positions the zip was at. Crashes don't end the flight, and the zip goes back to the start of the world once it's
+    past FLIGHT_MAX_X, so it can fly for as long as needed.
+    """
+    positions = []
+    elapsed = 0.0
+    for _ in range(ticks):
+        start = time.perf_counter()
+        sim.step(0.0, False)
+        elapsed += time.perf_counter() - start
+        sim.result = None
+        x, y = sim.vehicle.position
+        positions.append((x, y))
+        if x >= FLIGHT_MAX_X:
+            sim.vehicle.move((-x, 0.0))
+    return elapsed, positions
+
+
+def dense_world(seed, num_trees, far_trees):
+    """ The world for the seed with num_trees trees spread over it, and far_trees more packed in beyond FAR_X_MIN. The
+    zip's surroundings are the same whatever far_trees is.
+    """
+    world = generate_world(seed, num_trees)
+    rng = random.Random(seed)
+    world.trees.extend(Tree((round(rng.uniform(FAR_X_MIN, TREE_X_BOUNDS[1]), 1), round(rng.uniform(0, WORLD_WIDTH), 1)),
+                            world.store) for _ in range(far_trees))
+    return world
+
+
+def measure(seed, num_trees, ticks, far_trees=0):
+    """ Flies a dense_world() for ticks ticks, then times the lidar cast and the collision check again on their own
+    from every position the zip went through.
+    """
+    sim = Simulation(world=dense_world(seed, num_trees, far_trees))
+    elapsed, positions = fly_straight(sim, ticks)
+
+    lidar_index = sim.lidar_index
+    lidar = sim.lidar
+    start = time.perf_counter()
+    for position in positions:
+        lidar_index.cast(position, lidar)
+    lidar_elapsed = time.perf_counter() - start
+
+    collision_index = sim.collision_index
+    start = time.perf_counter()
+    for position in positions:
+        collision_index.contains(position)
+    collision_elapsed = time.perf_counter() - start
+
+    lidar_circles = sum(last - first for first, last in (lidar_index.span(x, LIDAR_MAX_DISTANCE) for x, _ in positions))
+    collision_circles = sum(len(collision_index.rows_near(x, 0.0)) for x, _ in positions)
+    return Measurement(num_trees, far_trees, ticks / elapsed, lidar_elapsed / ticks * 1e6,
+                       collision_elapsed / ticks * 1e6, lidar_circles / ticks, collision_circles / ticks)
+
+
+def density_failures(measurements, slack=DEFAULT_SLACK):
+    """ Compares each measurement with the one at the next lower density, and describes every hot path whose cost grew
+    by more than slack times the growth of the local density it sees. A count of one is added to the densities, so
+    that the fixed cost of an empty neighborhood doesn't count as superlinear.
+    """
+    failures = []
+    for low, high in zip(measurements, measurements[1:]):
+        for name, cost, circles in (("lidar", lambda m: m.lidar_us, lambda m: m.lidar_circles),
+                                    ("collision", lambda m: m.collision_us, lambda m: m.collision_circles)):
+            allowed = slack * max(1.0, (circles(high) + 1.0) / (circles(low) + 1.0))
+            growth = cost(high) / cost(low)
+            if growth > allowed:
+                failures.append("{} cost grew {:.1f}x from {} to {} trees, more than the {:.1f}x allowed".format(
+                    name, growth, low.num_trees, high.num_trees, allowed))
+    return failures
+
+
+def far_tree_failures(measurements, slack=DEFAULT_SLACK):
+    """ Compares each measurement with the first, which has the fewest far trees, and describes every cost that grew by
+    more than slack times the growth of the logarithm of the number of trees. The zip's surroundings are the same in
+    all of them, so only bisecting the indices should take longer, unless a hot path pays for trees out of its reach.
+    """
+    failures = []
+    base = measurements[0]
+    for m in measurements[1:]:
+        allowed = slack * math.log(m.num_trees + m.far_trees + 2) / math.log(base.num_trees + base.far_trees + 2)
+        for name, cost in (("tick", lambda m: 1.0 / m.ticks_per_sec), ("lidar", lambda m: m.lidar_us),
+                           ("collision", lambda m: m.collision_us)):
+            growth = cost(m) / cost(base)
+            if growth > allowed:
+                failures.append("{} cost grew {:.1f}x with {} far trees instead of {}, more than the {:.1f}x "
+                                "allowed".format(name, growth, m.far_trees, base.far_trees, allowed))
+    return failures
+
+
+def print_table(measurements):
+    print("{:>8} {:>8} {:>10} {:>10} {:>10} {:>14} {:>14}".format("trees", "far", "ticks/s", "lidar us", "collide us",
+                                                                  "lidar circles", "tree circles"))
+    for m in measurements:
+        print("{:>8} {:>8} {:>10.0f} {:>10.1f} {:>10.2f} {:>14.1f} {:>14.2f}".format(*m))
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Measure how the simulation hot paths scale with the density of trees')
+    parser.add_argument('--trees', type=int, nargs='+', default=DEFAULT_TREES,
+                        help='Numbers of trees in the worlds to fly, from sparsest to densest')
+    parser.add_argument('--far-trees', type=int, nargs='+', default=DEFAULT_FAR_TREES,
+                        help='Numbers of trees to add out of the zip\'s reach, from fewest to most, to check that the '
+                             'cost depends on the trees near the zip rather than on all of them')
+    parser.add_argument('--near-trees', type=int, default=DEFAULT_NEAR_TREES,
+                        help='Number of trees spread over the worlds with far trees. Defaults to %(default)s')
+    parser.add_argument('--ticks', type=int, default=2000, help='Number of ticks to fly in each world')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the worlds')
+    parser.add_argument('--slack', type=float, default=DEFAULT_SLACK,
+                        help='How much more a hot path\'s cost may grow than the local density it sees before the '
+                             'benchmark fails')
+    args = parser.parse_args()
+    for name, counts in (("--trees", args.trees), ("--far-trees", args.far_trees)):
+        if sorted(counts) != counts or counts[0] < 0:
+            parser.error("{} must be increasing and not negative".format(name))
+    if args.near_trees < 0:
+        parser.error("--near-trees can't be negative")
+    if args.ticks <= 0:
+        parser.error("--ticks must be positive")
+
+    density = [measure(args.seed, num_trees, args.ticks) for num_trees in args.trees]
+    print_table(density)
+    print()
+    far = [measure(args.seed, args.near_trees, args.ticks, far_trees) for far_trees in args.far_trees]
+    print_table(far)
+
+    failures = density_failures(density, args.slack) + far_tree_failures(far, args.slack)
+    for failure in failures:
+        print(failure)
+    sys.exit(1 if failures else 0)
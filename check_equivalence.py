@@ -0,0 +1,166 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+import numpy as np
+
+from vector_sim import VectorSim
+from zip_sim import (DEFAULT_LIDAR, LIDAR_TAG, WORLD_LENGTH, WORLD_WIDTH, WORLD_WIDTH_HALF, EntityStore,
+                     InProcessPilot, Lidar, LidarIndex, Simulation, WorldBank, cast_lidar_binned, cast_lidar_circles,
+                     cast_lidar_ray, generate_world)
+
+# The lidars cast besides the standard one. cast_lidar_ray only reports whole meters, so the lidars in decimeters are
+# checked against cast_lidar_circles instead.
+LIDARS = [Lidar(1, 0.0), Lidar(7, 10.0), Lidar(101, 60.0), Lidar(301, 120.0), Lidar(31, 30.0, True),
+          Lidar(301, 120.0, True)]
+# How many lidar objects the random worlds have, from none up to more than any generated world
+OBJECT_COUNTS = [0, 1, 5, 30, 110, 400]
+# The radii of the random lidar objects: delivery sites, trees, and anything in between
+OBJECT_RADII = [0.5, 3.0, None]
+# The share of casts made from just behind an object, where the lidar is blind or the ranges are short
+NEAR_CAST_SHARE = 0.3
+
+
+def random_index(rng):
+    """ A LidarIndex of lidar objects scattered over the world, and their (x, y, radius) in store order. """
+    store = EntityStore()
+    for _ in range(rng.choice(OBJECT_COUNTS)):
+        radius = rng.choice(OBJECT_RADII)
+        store.add((rng.uniform(0.0, WORLD_LENGTH), rng.uniform(0.0, WORLD_WIDTH)),
+                  rng.uniform(0.1, 6.0) if radius is None else radius, LIDAR_TAG)
+    rows = store.rows(LIDAR_TAG)
+    circles = [(x, y, r) for (x, y), r in zip(store.position[rows].tolist(), store.radius[rows].tolist())]
+    return LidarIndex(store, rows), circles
+
+
+def random_start(rng, circles):
+    """ A position to cast from, most of the time anywhere, otherwise just behind one of the circles. """
+    if circles and rng.random() < NEAR_CAST_SHARE:
+        x, y, _ = rng.choice(circles)
+        return (x - rng.uniform(-1.0, 8.0)) % WORLD_LENGTH, (y + rng.uniform(-6.0, 6.0)) % WORLD_WIDTH
+    return rng.uniform(0.0, WORLD_LENGTH), rng.uniform(0.0, WORLD_WIDTH)
+
+
+def relative_circles(circles, start_pos):
+    """ The circles ahead of start_pos, in its frame, the same as cast_lidar passes them on. """
+    start_x, start_y = start_pos
+    return [(x - start_x, (y - start_y + WORLD_WIDTH_HALF) % WORLD_WIDTH - WORLD_WIDTH_HALF, r)
+            for x, y, r in circles if x > start_x]
+
+
+def lidar_failures(seed, worlds, casts):
+    """ Casts every lidar from random positions in worlds random worlds with each lidar engine, and describes every
+    cast that doesn't give exactly the ranges of cast_lidar_ray.
+    """
+    rng = random.Random(seed)
+    failures = []
+    for world in range(worlds):
+        index, circles = random_index(rng)
+        for _ in range(casts):
+            start_pos = random_start(rng, circles)
+            relative = relative_circles(circles, start_pos)
+            for lidar in [DEFAULT_LIDAR] + LIDARS:
+                engines = [("cast_lidar_binned", cast_lidar_binned(relative, lidar)),
+                           ("LidarIndex.cast", list(index.cast(start_pos, lidar)))]
+                if lidar.decimeters:
+                    reference_name = "cast_lidar_circles"
+                    reference = cast_lidar_circles(np.array(relative).reshape(-1, 3), lidar)
+                else:
+                    reference_name = "cast_lidar_ray"
+                    reference = [cast_lidar_ray(angle, relative) for angle in lidar.angles]
+                    engines.append(("cast_lidar_circles", cast_lidar_circles(np.array(relative).reshape(-1, 3),
+                                                                             lidar)))
+                for name, ranges in engines:
+                    if ranges != reference:
+                        failures.append("{} differs from {} with {} beams over {} degrees{} in random world {} "
+                                        "from {}".format(name, reference_name, lidar.beams, lidar.fov,
+                                                         " in decimeters" if lidar.decimeters else "", world,
+                                                         start_pos))
+    return failures
+
+
+def vector_failures(seeds, pilot_module):
+    """ Flies the worlds of seeds in a VectorSim and in a Simulation each, both commanded by an in-process pilot that
+    reads the Simulation's telemetry, and describes every world whose telemetry or outcome differs.
+    """
+    vector_sim = VectorSim(seeds)
+    sims = [Simulation(seed) for seed in seeds]
+    pilots = [InProcessPilot.from_spec(pilot_module) for _ in seeds]
+    lateral_airspeed = np.zeros(len(seeds))
+    drop_package = np.zeros(len(seeds), dtype=bool)
+    telemetry = vector_sim.telemetry()
+    failed = set()
+    while vector_sim.active.any():
+        worlds = np.flatnonzero(vector_sim.active).tolist()
+        for world, record in zip(worlds, vector_sim.telemetry_records(telemetry, worlds)):
+            sim_telemetry = sims[world].telemetry()
+            if sims[world].result is not None or list(map(float, record)) != list(map(float, sim_telemetry)):
+                failed.add(world)
+            # Holds aren't flown in a VectorSim, so every command is taken as a fresh one
+            command = pilots[world].exchange(sim_telemetry)
+            lateral_airspeed[world] = command.lateral_airspeed
+            drop_package[world] = command.drop_package
+            sims[world].step(command.lateral_airspeed, command.drop_package)
+        telemetry = vector_sim.step(lateral_airspeed, drop_package)
+    for world, (outcome, sim) in enumerate(zip(vector_sim.outcomes(), sims)):
+        if outcome != sim.outcome():
+            failed.add(world)
+    return ["VectorSim flies the world of seed {} differently from Simulation".format(seeds[world])
+            for world in sorted(failed)]
+
+
+def world_bank_failures(seeds):
+    """ Builds a WorldBank of the worlds of seeds, and describes every world loaded from it that isn't the same as the
+    one generated from its seed.
+    """
+    failures = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "worlds.npy")
+        WorldBank.build(path, seeds, processes=1)
+        world_bank = WorldBank(path)
+        for index, seed in enumerate(seeds):
+            generated = generate_world(seed)
+            loaded = world_bank.world(index)
+            size = generated.store.size
+            if (loaded.store.size != size or world_bank.seed(index) != seed or
+                    loaded.rng.getstate() != generated.rng.getstate() or
+                    loaded.wind.vector != generated.wind.vector or
+                    [t.position for t in loaded.trees] != [t.position for t in generated.trees] or
+                    [s.position for s in loaded.delivery_sites] != [s.position for s in generated.delivery_sites] or
+                    not np.array_equal(loaded.store.position[:size], generated.store.position[:size]) or
+                    not np.array_equal(loaded.store.radius[:size], generated.store.radius[:size]) or
+                    not np.array_equal(loaded.store.tag[:size], generated.store.tag[:size])):
+                failures.append("WorldBank loads the world of seed {} differently from generate_world".format(seed))
+    return failures
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Check that the faster lidar engines and simulations give exactly '
+                                                 'the same results as the reference ones')
+    parser.add_argument('--lidar-worlds', type=int, default=60, help='Number of random worlds to cast the lidars in')
+    parser.add_argument('--lidar-casts', type=int, default=40, help='Number of casts in each random world')
+    parser.add_argument('--flights', type=int, default=20,
+                        help='Number of worlds to fly in a VectorSim and a Simulation each, and to load from a '
+                             'WorldBank')
+    parser.add_argument('--pilot-module', metavar="MODULE:CLASS", default="my_pilot:ReflexAgent",
+                        help='The in-process pilot that flies the worlds. Defaults to %(default)s')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the random worlds and of the first flight')
+    args = parser.parse_args()
+    if args.lidar_worlds < 0 or args.lidar_casts < 0 or args.flights < 0:
+        parser.error("--lidar-worlds, --lidar-casts and --flights can't be negative")
+
+    seeds = list(range(args.seed, args.seed + args.flights))
+    failures = lidar_failures(args.seed, args.lidar_worlds, args.lidar_casts)
+    print("lidar: {} failures".format(len(failures)))
+    vector = vector_failures(seeds, args.pilot_module)
+    print("VectorSim: {} failures".format(len(vector)))
+    world_bank = world_bank_failures(seeds)
+    print("WorldBank: {} failures".format(len(world_bank)))
+
+    failures += vector + world_bank
+    for failure in failures:
+        print(failure)
+    sys.exit(1 if failures else 0)
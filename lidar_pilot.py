@@ -0,0 +1,68 @@
+import math
+import struct
+import sys
+
+# A minimal pilot for any lidar. A simulation with a non-standard lidar sends a handshake before the first telemetry,
+# which gives the number of beams, the field of view and the range units. Without one, the lidar is the standard
+# 31 beams over 30 degrees in meters. This pilot only dodges trees and heads for the recovery area, it never drops.
+HANDSHAKE_STRUCT = struct.Struct(">4sBHfBB")
+HANDSHAKE_MAGIC = b"ZIPT"
+TELEMETRY_HEADER_FORMAT = ">Hhffb"
+COMMAND_STRUCT = struct.Struct(">fB3s")
+LIDAR_DECIMETERS = 1
+
+# Steer away from anything closer than this many meters
+DODGE_DISTANCE = 40.0
+MAX_LATERAL_AIRSPEED = 30.0
+
+
+class LidarPilot:
+
+  def __init__(self, beams = 31, fov = 30.0, units = 0):
+    sampleFormat = "H" if units == LIDAR_DECIMETERS else "B"
+    self.telemetryStruct = struct.Struct(TELEMETRY_HEADER_FORMAT + "{}{}".format(beams, sampleFormat))
+    self.metersPerUnit = 0.1 if units == LIDAR_DECIMETERS else 1.0
+    step = fov / (beams - 1) if beams > 1 else 0.0
+    self.angles = [(i - (beams - 1) / 2.0) * step for i in range(beams)]
+
+  # Decide the lateral airspeed for one frame of telemetry
+  def getAction(self, telemetry):
+    timestamp, recovery_x_error, wind_x, wind_y, recovery_y_error = telemetry[:5]
+    samples = telemetry[5:]
+
+    # Head for the recovery area, against the wind
+    lateral_airspeed = recovery_y_error - wind_y
+
+    # Dodge the nearest return, away from the side it's on. A range of 0 means nothing was seen.
+    hits = [(sample * self.metersPerUnit, angle) for sample, angle in zip(samples, self.angles) if sample > 0]
+    if hits:
+      distance, angle = min(hits)
+      if distance < DODGE_DISTANCE:
+        lateral_airspeed = -wind_y - math.copysign(MAX_LATERAL_AIRSPEED, angle)
+
+    return max(-MAX_LATERAL_AIRSPEED, min(MAX_LATERAL_AIRSPEED, lateral_airspeed)), False
+
+
+# Read the handshake, if there is one, and return the pilot for the lidar it describes and the bytes read past it
+def readHandshake():
+  magic = sys.stdin.buffer.read(len(HANDSHAKE_MAGIC))
+  if magic != HANDSHAKE_MAGIC:
+    # The standard lidar. What was read is the start of the first telemetry.
+    return LidarPilot(), magic
+  fields = HANDSHAKE_STRUCT.unpack(magic + sys.stdin.buffer.read(HANDSHAKE_STRUCT.size - len(magic)))
+  _, version, beams, fov, units, flags = fields
+  return LidarPilot(beams, fov, units), b''
+
+
+if __name__ == "__main__":
+
+  pilot, data = readHandshake()
+  size = pilot.telemetryStruct.size
+  while True:
+    data += sys.stdin.buffer.read(size - len(data))
+    if len(data) != size:
+      break
+    lateral_airspeed, drop_package = pilot.getAction(pilot.telemetryStruct.unpack(data))
+    data = b''
+    sys.stdout.buffer.write(COMMAND_STRUCT.pack(lateral_airspeed, int(drop_package), b'3s'))
+    sys.stdout.flush()
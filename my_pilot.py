@@ -6,6 +6,12 @@ import threading
   
 TELEMETRY_STRUCT = struct.Struct(">Hhffb31B")
 COMMAND_STRUCT = struct.Struct(">fB3s")
+
+# Batched messages: a count, then that many (world ID + telemetry) records. Answered by one (world ID + command)
+# record per world, in the same order.
+BATCH_HEADER_STRUCT = struct.Struct(">I")
+BATCH_TELEMETRY_STRUCT = struct.Struct(">IHhffb31B")
+BATCH_COMMAND_STRUCT = struct.Struct(">IfB3s")
 showSites = False
 showTrees = False
 
@@ -22,9 +28,11 @@ class Agent:
 
 
   # Update the value from ReadDate
-  def update(self):
+  # An in-process simulator can pass the unpacked telemetry tuple directly instead of going through stdin.
+  def update(self, telemetry = None):
   
-    telemetry = self.readData()
+    if telemetry is None:
+      telemetry = self.readData()
     if telemetry == False:
       return False
       
@@ -584,6 +592,60 @@ class TestAgent(Agent):
 
     return lateral_airspeed, drop_package
 
+# BatchAgent: Flies many worlds at once for a simulator that uses the batched messages.
+# It keeps one agent of the chosen type for each world and decides for all of them every exchange.
+class BatchAgent:
+
+  def __init__(self, type = 'Native'):
+    self.type = type
+    self.agents = {}
+    self.worldIds = []
+
+  # Read one batch and update the agent of every world in it
+  def update(self):
+
+    telemetries = self.readData()
+    if telemetries == False:
+      return False
+
+    # A world that is missing from the batch has finished flying
+    agents = {}
+    self.worldIds = []
+    for telemetry in telemetries:
+      worldId = telemetry[0]
+      agent = self.agents.get(worldId)
+      if agent is None:
+        agent = createAgent(self.type)
+      agent.update(telemetry[1:])
+      agents[worldId] = agent
+      self.worldIds.append(worldId)
+
+    self.agents = agents
+    return True
+
+  # Decide the action of every world in the last batch
+  def getAction(self):
+    return [(worldId, self.agents[worldId].getAction()) for worldId in self.worldIds]
+
+  # Read a whole batch from parent process and unpack the data
+  def readData(self):
+    header = sys.stdin.buffer.read(BATCH_HEADER_STRUCT.size)
+    if len(header) != BATCH_HEADER_STRUCT.size:
+      return False
+    count, = BATCH_HEADER_STRUCT.unpack(header)
+
+    data = sys.stdin.buffer.read(count * BATCH_TELEMETRY_STRUCT.size)
+    if len(data) != count * BATCH_TELEMETRY_STRUCT.size:
+      return False
+    return list(BATCH_TELEMETRY_STRUCT.iter_unpack(data))
+
+  # Return the control inputs of all worlds to parent process in one write
+  def writeData(self, actions):
+    data = b''.join(BATCH_COMMAND_STRUCT.pack(worldId, lateral_airspeed, int(drop_package), b'3s')
+                    for worldId, (lateral_airspeed, drop_package) in actions)
+    sys.stdout.buffer.write(data)
+    sys.stdout.flush()
+
 # Create a specific type of agent
 def createAgent(type = 'Native'):
   if type == 'Native':
@@ -612,6 +674,7 @@ if __name__ == "__main__":
   parser.add_argument('-a', '--agent', nargs=argparse.REMAINDER, help='choose agent Type. Default: Native')
   parser.add_argument('--sites', action="store_true", help ='show all sites')
   parser.add_argument('--trees', action="store_true", help ='show all trees')
+  parser.add_argument('--batch', action="store_true", help ='fly many worlds per exchange using batched messages')
   
   if parser.parse_args().agent:
     agent_type = parser.parse_args().agent[0]
@@ -619,7 +682,10 @@ if __name__ == "__main__":
     agent_type = '' # If no selection, use Native agent
     
   #Create agent with agent_type
-  agent = createAgent(agent_type)
+  if parser.parse_args().batch:
+    agent = BatchAgent(agent_type)
+  else:
+    agent = createAgent(agent_type)
   
   showSites = parser.parse_args().sites
   showTrees = parser.parse_args().trees
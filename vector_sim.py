@@ -0,0 +1,479 @@
+import argparse
+import collections
+import copy
+import math
+import random
+import time
+
+import numpy as np
+
+import zip_sim
+from zip_sim import (DT_SEC, WORLD_WIDTH, WORLD_LENGTH, WORLD_WIDTH_HALF, WORLD_LENGTH_HALF, PACKAGE_FALL_SEC,
+                     RECOVERY_X, RECOVERY_Y_MIN, RECOVERY_Y_MAX, NUM_DELIVERY_SITES, VEHICLE_AIRSPEED,
+                     MAX_WINDSPEED_M_S, LIDAR_MAX_DISTANCE, LIDAR_ANGLES, DELIVERY_SITE_RADIUS,
+                     DELIVERY_SITE_LIDAR_RADIUS, TREE_COLLISION_RADIUS, TREE_LIDAR_RADIUS, RECOVERED, PARALANDED,
+                     CRASHED, LIDAR_SIN, LIDAR_NEG_COS, Outcome, BatchSubprocessPilot, wind_sigmas)
+
+# Value of VectorSim.result for worlds that are still flying.
+IN_FLIGHT = -1
+
+# The x of world k's lidar objects are offset by k * LIDAR_KEY_STRIDE in LidarBatchIndex, so that the worlds don't
+# overlap and can all be searched at once. Padding sorts at the end of its world.
+LIDAR_KEY_STRIDE = 2 * WORLD_LENGTH
+LIDAR_PADDING_KEY = LIDAR_KEY_STRIDE - 1.0
+
+# VectorSim draws the wind noise of this many ticks at a time from each world's generator
+WIND_NOISE_TICKS = 256
+
+
+def wrapped_delta(a, b, period, period_half):
+    """ The absolute distance from a to b along one axis of the wrapping world, like Circle.contains. """
+    delta = np.abs(a - b)
+    return np.where(delta > period_half, period - delta, delta)
+
+
+def update_packages(position, velocity, fall_duration, in_flight):
+    """ Package.update by one tick, in place, for arrays of packages. Only the packages where in_flight is set move.
+
+    position and velocity are (..., 2) arrays, fall_duration and in_flight have the same leading shape.
+    """
+    dt = np.where(in_flight, np.minimum(DT_SEC, fall_duration), 0.0)
+    fall_duration -= dt
+    position[..., 0] = np.where(in_flight, (position[..., 0] + dt * velocity[..., 0]) % WORLD_LENGTH, position[..., 0])
+    position[..., 1] = np.where(in_flight, (position[..., 1] + dt * velocity[..., 1]) % WORLD_WIDTH, position[..., 1])
+
+
+def score_packages(position, velocity, fall_duration, dropped, delivery_sites):
+    """ Lets every dropped package finish falling and scores it the same way as Simulation.outcome.
+
+    position, velocity and fall_duration describe (rows, packages) packages, and dropped says which of them are real.
+    delivery_sites is a (rows, sites, 2) array, or (1, sites, 2) when every row shares a world. Returns the number of
+    deliveries and ZIPAA violations of every row.
+    """
+    dt = np.minimum(PACKAGE_FALL_SEC, fall_duration)
+    landing_x = (position[:, :, 0] + dt * velocity[:, :, 0]) % WORLD_LENGTH
+    landing_y = (position[:, :, 1] + dt * velocity[:, :, 1]) % WORLD_WIDTH
+
+    # (rows, packages, sites)
+    delta_x = wrapped_delta(landing_x[:, :, None], delivery_sites[:, None, :, 0], WORLD_LENGTH, WORLD_LENGTH_HALF)
+    delta_y = wrapped_delta(landing_y[:, :, None], delivery_sites[:, None, :, 1], WORLD_WIDTH, WORLD_WIDTH_HALF)
+    delivered = dropped[:, :, None] & (delta_x * delta_x + delta_y * delta_y <
+                                       DELIVERY_SITE_RADIUS * DELIVERY_SITE_RADIUS)
+    package_count_by_site = delivered.sum(axis=1)
+    return (np.count_nonzero(package_count_by_site, axis=1),
+            np.maximum(package_count_by_site - 1, 0).sum(axis=1))
+
+
+def cast_lidar_batch(start_pos, objects):
+    """ The same as zip_sim.cast_lidar_circles, for K worlds at once.
+
+    start_pos is a (K, 2) array of vehicle positions. objects is a (K, N, 3) array of (x, y, radius) lidar circles.
+    Worlds with fewer than N objects are padded with zero radius circles, which never reflect. Returns a
+    (K, len(LIDAR_ANGLES)) array of ranges.
+    """
+    rel_x = objects[:, :, 0] - start_pos[:, 0, None]
+    rel_y = (objects[:, :, 1] - start_pos[:, 1, None] + WORLD_WIDTH_HALF) % WORLD_WIDTH - WORLD_WIDTH_HALF
+    radius = objects[:, :, 2]
+    # Objects behind the vehicle are ignored, the same as padding.
+    ahead = rel_x > 0
+    # If the vehicle is inside any object, every ray is blind.
+    blind = np.any(ahead & (rel_x * rel_x + rel_y * rel_y <= radius * radius), axis=1)
+
+    # Anything whose near edge is past the point where ranges round up beyond LIDAR_MAX_DISTANCE can't produce a
+    # return. The objects that can are gathered into one flat list of (world, object) pairs, so that the ray math costs
+    # the same for worlds with few objects ahead as for the busiest.
+    ahead &= rel_x - radius < LIDAR_MAX_DISTANCE + 0.5
+    world, column = np.nonzero(ahead)
+
+    # Broadcast to (pairs, rays). The arithmetic is written in the same order as cast_lidar_ray so that the rounded
+    # results agree with it.
+    a = LIDAR_SIN[None, :]
+    b = LIDAR_NEG_COS[None, :]
+    rel_x = rel_x[world, column][:, None]
+    rel_y = rel_y[world, column][:, None]
+    radius = radius[world, column][:, None]
+    signed_c = -(a * rel_x + b * rel_y)
+    num_wraps = np.round(signed_c / (b * WORLD_WIDTH))
+    signed_c -= num_wraps * b * WORLD_WIDTH
+    hit = np.abs(signed_c) < radius
+
+    # Only a few rays hit anything, so finish the intersection math on just those.
+    pair, ray = np.nonzero(hit)
+    a = LIDAR_SIN[ray]
+    b = LIDAR_NEG_COS[ray]
+    signed_c = signed_c[pair, ray]
+    num_wraps = num_wraps[pair, ray]
+    radius = radius[pair, 0]
+    gnarly_math = np.sqrt(radius * radius - signed_c * signed_c)
+    x = a * signed_c + b * gnarly_math + rel_x[pair, 0]
+    y = b * signed_c - a * gnarly_math + rel_y[pair, 0] + num_wraps * WORLD_WIDTH
+    distance = np.full((start_pos.shape[0], len(LIDAR_ANGLES)), np.inf)
+    np.minimum.at(distance, (world[pair], ray), np.sqrt(x * x + y * y))
+
+    distance = np.round(distance)
+    distance[~(distance <= LIDAR_MAX_DISTANCE)] = 0
+    distance[blind] = 0
+    return distance.astype(np.int64)
+
+
+class LidarBatchIndex():
+    """ The lidar objects of K worlds, each world's sorted by x, so that a cast only looks at the few objects close
+    enough ahead of each vehicle to matter, like zip_sim.LidarIndex. The worlds are searched all at once in one flat
+    array of keys, the x of every object offset by LIDAR_KEY_STRIDE times the index of its world.
+    """
+    __slots__ = ["_circles", "_keys", "_max_radius"]
+
+    def __init__(self, objects):
+        """ objects is a (K, N, 3) array of (x, y, radius) lidar circles, padded with zero radius circles the same as
+        for cast_lidar_batch.
+        """
+        x = np.where(objects[:, :, 2] > 0.0, objects[:, :, 0], LIDAR_PADDING_KEY)
+        order = np.argsort(x, axis=1, kind="stable")
+        self._circles = np.take_along_axis(objects, order[:, :, None], axis=1).reshape(-1, 3)
+        self._keys = (np.take_along_axis(x, order, axis=1) +
+                      np.arange(len(objects))[:, None] * LIDAR_KEY_STRIDE).ravel()
+        self._max_radius = objects[:, :, 2].max(initial=0.0)
+
+    def span(self, worlds, start_x, distance):
+        """ The ranges of flat indices of the circles of each of worlds whose centers are ahead of start_x by less
+        than distance, as two arrays. The keys are rounded, so circles within a hair of either end may be in or out.
+        """
+        offset = worlds * LIDAR_KEY_STRIDE
+        return (np.searchsorted(self._keys, offset + start_x, side="right"),
+                np.searchsorted(self._keys, offset + start_x + distance, side="left"))
+
+    def window(self, worlds, start_pos):
+        """ A (len(worlds), W, 3) array of the circles of each of worlds that could be seen from start_pos, padded
+        with zero radius circles to the most that any of them has.
+        """
+        # Like LidarIndex.cast, nothing farther ahead than this can contain the vehicle or return a range up to
+        # LIDAR_MAX_DISTANCE. The extra meter on each side covers the rounding of the keys.
+        first, last = self.span(worlds, start_pos[:, 0] - 1.0, LIDAR_MAX_DISTANCE + 2 + self._max_radius)
+        count = last - first
+        columns = np.arange(count.max(initial=0))
+        window = self._circles[np.minimum(first[:, None] + columns, len(self._circles) - 1)]
+        # Columns past the end of a world's span hold the next world's circles
+        window[columns[None, :] >= count[:, None], 2] = 0.0
+        return window
+
+    def cast(self, worlds, start_pos):
+        """ The same as cast_lidar_batch, for each of worlds from start_pos. """
+        return cast_lidar_batch(start_pos, self.window(worlds, start_pos))
+
+
+class VectorSim():
+    """ K independent flights advanced in lockstep, with all of their state kept in NumPy arrays.
+
+    Worlds are generated with the same generators and per-world random streams as zip_sim.Simulation, so world k of
+    VectorSim(seeds) flies the same world and wind as Simulation(seeds[k]). Worlds that have finished are frozen while
+    the rest keep flying, and the lidar, collisions and wind of a step are only worked out for the worlds still flying:
+
+        sim = VectorSim(range(1000))
+        telemetry = sim.telemetry()
+        while sim.active.any():
+            telemetry = sim.step(lateral_airspeed, drop_package)
+        outcomes = sim.outcomes()
+    """
+
+    def __init__(self, seeds):
+        self.reset(seeds)
+
+    def reset(self, seeds):
+        """ Generates a world for each seed and returns the first telemetry. """
+        self.rngs = [random.Random(seed) for seed in seeds]
+        k = len(self.rngs)
+        worlds = []
+        for rng in self.rngs:
+            delivery_sites = zip_sim.generate_delivery_sites(rng)
+            trees = zip_sim.generate_trees(delivery_sites, rng)
+            # The initial wind is drawn right after the world, the same as Wind()
+            wind = (rng.uniform(0.0, MAX_WINDSPEED_M_S), rng.uniform(0.0, 2 * math.pi))
+            worlds.append((delivery_sites, trees, wind))
+
+        # Tree tables are padded to the busiest world. tree_mask says which entries are real.
+        max_trees = max((len(trees) for _, trees, _ in worlds), default=0)
+        self.trees = np.zeros((k, max_trees, 2))
+        self.tree_mask = np.zeros((k, max_trees), dtype=bool)
+        self.delivery_sites = np.zeros((k, NUM_DELIVERY_SITES, 2))
+        for i, (delivery_sites, trees, _) in enumerate(worlds):
+            self.trees[i, :len(trees)] = [t.position for t in trees]
+            self.tree_mask[i, :len(trees)] = True
+            self.delivery_sites[i] = [s.position for s in delivery_sites]
+        # Lidar objects are (x, y, radius), trees first, the same as Simulation.lidar_objects
+        self.lidar_objects = np.concatenate((
+            np.dstack((self.trees, np.where(self.tree_mask, TREE_LIDAR_RADIUS, 0.0)[:, :, None])),
+            np.dstack((self.delivery_sites, np.full((k, NUM_DELIVERY_SITES, 1), DELIVERY_SITE_LIDAR_RADIUS)))), axis=1)
+        self.lidar_index = LidarBatchIndex(self.lidar_objects)
+
+        self.position = np.zeros((k, 2))
+        self.wind_speed = np.array([speed for _, _, (speed, _) in worlds])
+        self.wind_direction = np.array([direction for _, _, (_, direction) in worlds])
+        self.lateral_airspeed = np.zeros(k)
+        self.was_package_dropped = np.zeros(k, dtype=bool)
+        self.num_packages = np.full(k, NUM_DELIVERY_SITES, dtype=np.int64)
+        # Dropped packages, in drop order. num_dropped says how many slots of each world are in use.
+        self.package_position = np.zeros((k, NUM_DELIVERY_SITES, 2))
+        self.package_velocity = np.zeros((k, NUM_DELIVERY_SITES, 2))
+        self.package_fall_duration = np.zeros((k, NUM_DELIVERY_SITES))
+        self.num_dropped = np.zeros(k, dtype=np.int64)
+        self.loop_count = np.zeros(k, dtype=np.int64)
+        self.result = np.full(k, IN_FLIGHT, dtype=np.int64)
+        # The ranges of the last cast of every world. Finished worlds don't move, so theirs stay as they were.
+        self.lidar_ranges = self.lidar_index.cast(np.arange(k), self.position)
+        self._wind_noise = np.zeros((k, WIND_NOISE_TICKS, 2))
+        self._num_steps = 0
+        return self.telemetry()
+
+    @property
+    def active(self):
+        """ Mask of the worlds that are still flying. """
+        return self.result == IN_FLIGHT
+
+    @property
+    def wind_vector(self):
+        return np.column_stack((self.wind_speed * np.cos(self.wind_direction),
+                                self.wind_speed * np.sin(self.wind_direction)))
+
+    def telemetry(self):
+        """ The telemetry of every world as arrays, one row per world, in TELEMETRY_STRUCT field order:
+        (timestamp, recovery_x_error, wind_x, wind_y, recovery_y_error, lidar_samples).
+        """
+        wind_vector = self.wind_vector
+        return ((self.loop_count * DT_SEC * 1e3).astype(np.int64) & 0xFFFF,
+                np.round(RECOVERY_X - self.position[:, 0]).astype(np.int64),
+                wind_vector[:, 0],
+                wind_vector[:, 1],
+                np.round((-self.position[:, 1] + WORLD_WIDTH_HALF) % WORLD_WIDTH - WORLD_WIDTH_HALF).astype(np.int64),
+                self.lidar_ranges)
+
+    def step(self, lateral_airspeed, drop_package):
+        """ Advances every active world by one tick of DT_SEC and returns the next telemetry.
+
+        lateral_airspeed and drop_package are arrays with one entry per world (or scalars). Entries for finished worlds
+        are ignored.
+        """
+        active = self.active
+        flying = np.flatnonzero(active)
+        self.loop_count[active] += 1
+        self.lateral_airspeed = np.where(active, np.clip(lateral_airspeed, -30.0, 30.0), self.lateral_airspeed)
+        drop_package_commanded = np.broadcast_to(np.asarray(drop_package, dtype=bool), active.shape)
+
+        # Zip.update
+        wind_vector = self.wind_vector
+        velocity = np.column_stack((VEHICLE_AIRSPEED + wind_vector[:, 0], self.lateral_airspeed + wind_vector[:, 1]))
+        moved = np.column_stack(((self.position[:, 0] + DT_SEC * velocity[:, 0]) % WORLD_LENGTH,
+                                 (self.position[:, 1] + DT_SEC * velocity[:, 1]) % WORLD_WIDTH))
+        self.position[active] = moved[active]
+
+        # Check for collisions with trees
+        trees = self.trees[flying]
+        delta_x = wrapped_delta(trees[:, :, 0], self.position[flying, 0, None], WORLD_LENGTH, WORLD_LENGTH_HALF)
+        delta_y = wrapped_delta(trees[:, :, 1], self.position[flying, 1, None], WORLD_WIDTH, WORLD_WIDTH_HALF)
+        crashed = np.any(self.tree_mask[flying] & (delta_x * delta_x + delta_y * delta_y <
+                                                   TREE_COLLISION_RADIUS * TREE_COLLISION_RADIUS), axis=1)
+        self.result[flying[crashed]] = CRASHED
+
+        # Only the worlds that have dropped packages have any to move
+        dropped = flying[self.num_dropped[flying] > 0]
+        package_position = self.package_position[dropped]
+        package_fall_duration = self.package_fall_duration[dropped]
+        update_packages(package_position, self.package_velocity[dropped], package_fall_duration,
+                        np.arange(NUM_DELIVERY_SITES)[None, :] < self.num_dropped[dropped, None])
+        self.package_position[dropped] = package_position
+        self.package_fall_duration[dropped] = package_fall_duration
+
+        # Drop a package if commanded to, after updating physics, the same as Simulation.step
+        dropping = active & drop_package_commanded & ~self.was_package_dropped & (self.num_packages > 0)
+        worlds = np.flatnonzero(dropping)
+        slots = self.num_dropped[worlds]
+        self.package_position[worlds, slots] = self.position[worlds]
+        self.package_velocity[worlds, slots] = velocity[worlds]
+        self.package_fall_duration[worlds, slots] = PACKAGE_FALL_SEC
+        self.num_dropped[worlds] += 1
+        self.num_packages[worlds] -= 1
+        self.was_package_dropped = np.where(active, drop_package_commanded, self.was_package_dropped)
+
+        # Wind.update
+        if self._num_steps % WIND_NOISE_TICKS == 0:
+            self._draw_wind_noise(flying)
+        noise = self._wind_noise[:, self._num_steps % WIND_NOISE_TICKS]
+        self._num_steps += 1
+        self.wind_speed = np.where(active, np.clip(self.wind_speed + noise[:, 0], 0.0, MAX_WINDSPEED_M_S),
+                                   self.wind_speed)
+        self.wind_direction = np.where(active, (self.wind_direction + noise[:, 1]) % (2 * math.pi),
+                                       self.wind_direction)
+
+        x, y = self.position[:, 0], self.position[:, 1]
+        finished = active & (x >= RECOVERY_X)
+        self.result[finished] = np.where((y <= RECOVERY_Y_MIN) | (y >= RECOVERY_Y_MAX), RECOVERED, PARALANDED)[finished]
+
+        self.lidar_ranges[flying] = self.lidar_index.cast(flying, self.position[flying])
+        return self.telemetry()
+
+    def _draw_wind_noise(self, worlds):
+        """ Draws the wind noise of the next WIND_NOISE_TICKS ticks of each of worlds from its own generator, in the
+        same order as Wind.update draws it. Nothing else draws from the generators once the worlds are generated, so
+        drawing ahead doesn't change the noise, and the other worlds have finished and get none.
+        """
+        speed_sigma, direction_sigma = wind_sigmas(DT_SEC)
+        self._wind_noise[:] = 0.0
+        for world in worlds.tolist():
+            gauss = self.rngs[world].gauss
+            self._wind_noise[world] = [(gauss(0.0, speed_sigma), gauss(0.0, direction_sigma))
+                                       for _ in range(WIND_NOISE_TICKS)]
+
+    def telemetry_records(self, telemetry, worlds):
+        """ Converts rows of telemetry arrays into plain tuples that can be packed into TELEMETRY_STRUCT. """
+        timestamp, recovery_x, wind_x, wind_y, recovery_y, lidar_samples = (t[worlds].tolist() for t in telemetry)
+        return [(*fields, *samples)
+                for *fields, samples in zip(timestamp, recovery_x, wind_x, wind_y, recovery_y, lidar_samples)]
+
+    def outcomes(self):
+        """ Scores every world the same way as Simulation.outcome. Returns a list of Outcome, one per world. """
+        deliveries, zipaa_violations = score_packages(
+            self.package_position, self.package_velocity, self.package_fall_duration,
+            np.arange(NUM_DELIVERY_SITES)[None, :] < self.num_dropped[:, None], self.delivery_sites)
+        return [Outcome(None if result == IN_FLIGHT else int(result), int(d), int(v))
+                for result, d, v in zip(self.result, deliveries, zipaa_violations)]
+
+
+# A fixed world to evaluate open-loop command sequences in. trees and delivery_sites are (N, 2) arrays of positions,
+# wind is a (T, 2) array with the wind vector of every tick, position is where the zip starts and num_packages is how
+# many packages it carries.
+OpenLoopWorld = collections.namedtuple("OpenLoopWorld",
+                                       ["trees", "delivery_sites", "wind", "position", "num_packages"])
+
+# How each candidate sequence went, one entry per candidate. end_tick is the index of the command during which the
+# flight ended, or -1 if the sequence ran out first, in which case result is IN_FLIGHT.
+TrajectoryOutcomes = collections.namedtuple("TrajectoryOutcomes",
+                                            ["result", "end_tick", "deliveries", "zipaa_violations"])
+
+
+def open_loop_world(sim, ticks):
+    """ The world of a zip_sim.Simulation from its current tick on, with the wind it will see over the next ticks.
+
+    The wind doesn't depend on the zip, so evaluating a command sequence in this world gives the same outcome as
+    stepping sim with it. Packages the zip has already dropped aren't carried over. evaluate_trajectories() only flies
+    the default rate, so sim must tick at DT_SEC.
+    """
+    if sim.dt != DT_SEC:
+        raise ValueError("Open-loop worlds are flown at {}s per tick, not {}s".format(DT_SEC, sim.dt))
+    wind = copy.deepcopy(sim.wind)
+    wind_trace = np.empty((ticks, 2))
+    for tick in range(ticks):
+        wind_trace[tick] = wind.vector
+        wind.update(DT_SEC)
+    return OpenLoopWorld(np.array([t.position for t in sim.trees]).reshape(-1, 2),
+                         np.array([s.position for s in sim.delivery_sites]).reshape(-1, 2),
+                         wind_trace,
+                         sim.vehicle.position,
+                         sim.num_packages)
+
+
+def evaluate_trajectories(world, lateral_airspeed, drop_package):
+    """ Flies M candidate command sequences open-loop through one world at once, with the same rules as
+    Simulation.step, and returns their TrajectoryOutcomes.
+
+    lateral_airspeed and drop_package are (M, T) arrays with the command of every candidate for every tick. T may not
+    be more than the length of the world's wind trace.
+    """
+    lateral_airspeed = np.clip(np.asarray(lateral_airspeed, dtype=float), -30.0, 30.0)
+    drop_package = np.asarray(drop_package, dtype=bool)
+    num_candidates, num_ticks = lateral_airspeed.shape
+    num_packages = world.num_packages
+
+    # The forward speed only depends on the wind, so every candidate has the same x at every tick. Only y differs.
+    x = world.position[0]
+    y = np.full(num_candidates, float(world.position[1]))
+    result = np.full(num_candidates, IN_FLIGHT, dtype=np.int64)
+    end_tick = np.full(num_candidates, -1, dtype=np.int64)
+    was_package_dropped = np.zeros(num_candidates, dtype=bool)
+    packages_left = np.full(num_candidates, num_packages, dtype=np.int64)
+    package_position = np.zeros((num_candidates, num_packages, 2))
+    package_velocity = np.zeros((num_candidates, num_packages, 2))
+    package_fall_duration = np.zeros((num_candidates, num_packages))
+    num_dropped = np.zeros(num_candidates, dtype=np.int64)
+    trees_x, trees_y = world.trees[:, 0], world.trees[:, 1]
+
+    active = np.ones(num_candidates, dtype=bool)
+    for tick in range(num_ticks):
+        wind_x, wind_y = world.wind[tick].tolist()
+        # Zip.update
+        velocity_x = VEHICLE_AIRSPEED + wind_x
+        velocity_y = lateral_airspeed[:, tick] + wind_y
+        x = (x + DT_SEC * velocity_x) % WORLD_LENGTH
+        y = np.where(active, (y + DT_SEC * velocity_y) % WORLD_WIDTH, y)
+
+        # Only trees within the collision radius in x can be hit, and those are the same for every candidate.
+        delta_x = wrapped_delta(trees_x, x, WORLD_LENGTH, WORLD_LENGTH_HALF)
+        near = delta_x < TREE_COLLISION_RADIUS
+        if near.any():
+            delta_y = wrapped_delta(trees_y[near][None, :], y[:, None], WORLD_WIDTH, WORLD_WIDTH_HALF)
+            crashed = active & np.any(delta_x[near] * delta_x[near] + delta_y * delta_y <
+                                      TREE_COLLISION_RADIUS * TREE_COLLISION_RADIUS, axis=1)
+            result[crashed] = CRASHED
+
+        update_packages(package_position, package_velocity, package_fall_duration,
+                        active[:, None] & (np.arange(num_packages)[None, :] < num_dropped[:, None]))
+
+        # Drop a package if commanded to, after updating physics, the same as Simulation.step
+        dropping = np.flatnonzero(active & drop_package[:, tick] & ~was_package_dropped & (packages_left > 0))
+        slots = num_dropped[dropping]
+        package_position[dropping, slots] = np.column_stack((np.full(len(dropping), x), y[dropping]))
+        package_velocity[dropping, slots] = np.column_stack((np.full(len(dropping), velocity_x), velocity_y[dropping]))
+        package_fall_duration[dropping, slots] = PACKAGE_FALL_SEC
+        num_dropped[dropping] += 1
+        packages_left[dropping] -= 1
+        was_package_dropped = np.where(active, drop_package[:, tick], was_package_dropped)
+
+        if x >= RECOVERY_X:
+            result[active] = np.where((y <= RECOVERY_Y_MIN) | (y >= RECOVERY_Y_MAX), RECOVERED, PARALANDED)[active]
+
+        finished = active & (result != IN_FLIGHT)
+        end_tick[finished] = tick
+        active &= ~finished
+        if not active.any():
+            break
+
+    deliveries, zipaa_violations = score_packages(
+        package_position, package_velocity, package_fall_duration,
+        np.arange(num_packages)[None, :] < num_dropped[:, None], world.delivery_sites[None, :, :])
+    return TrajectoryOutcomes(result, end_tick, deliveries, zipaa_violations)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Fly many worlds at once')
+    parser.add_argument('pilot', nargs=argparse.REMAINDER,
+                        help='A pilot process that speaks the batched protocol, e.g. python my_pilot.py --batch. '
+                             'Without one, every world flies straight ahead.')
+    parser.add_argument('--count', type=int, default=100, help='Number of worlds to fly')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the first world')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    sim = VectorSim(range(args.seed, args.seed + args.count))
+    telemetry = sim.telemetry()
+    pilot = BatchSubprocessPilot(args.pilot) if args.pilot else None
+    lateral_airspeed = np.zeros(args.count)
+    drop_package = np.zeros(args.count, dtype=bool)
+    while sim.active.any():
+        if pilot is not None:
+            # One exchange per tick flies every world that's still in the air. World IDs are indices into the sim.
+            worlds = np.flatnonzero(sim.active)
+            commands = pilot.exchange_batch(worlds.tolist(), sim.telemetry_records(telemetry, worlds))
+            if commands is None:
+                sim.result[worlds] = CRASHED  # The pilot process must have exited
+                break
+            lateral_airspeed[worlds], drop_package[worlds] = zip(*commands)
+        telemetry = sim.step(lateral_airspeed, drop_package)
+    if pilot is not None:
+        pilot.close()
+    elapsed = time.perf_counter() - start
+
+    outcomes = sim.outcomes()
+    for name, code in (("Recovered", RECOVERED), ("Paralanded", PARALANDED), ("Crashed", CRASHED)):
+        print("{}: {}".format(name, sum(1 for o in outcomes if o.result == code)))
+    print("Deliveries: {}".format(sum(o.deliveries for o in outcomes)))
+    print("ZIPAA Violations: {}".format(sum(o.zipaa_violations for o in outcomes)))
+    print("{:.1f} flights/s".format(args.count / elapsed))
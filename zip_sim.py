@@ -1,14 +1,25 @@
 import argparse
+import bisect
+import collections
+import copy
+import hashlib
+import importlib
+import itertools
 import math
 import os
+import pickle
 import random
+import shlex
 import sys
 import subprocess
 import struct
+import time
 
-# Suppress hello from pygame so that stdout is clean
+import numpy as np
+
+# Suppress hello from pygame so that stdout is clean. Pygame itself is only imported once something is drawn, so
+# headless runs don't pay for it.
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
-import pygame  # noqa
 
 # The time step of the simulation. 60Hz is chosen to work well on most displays that are 60Hz.
 DT_SEC = 1 / 60.0
@@ -37,6 +48,7 @@ CAMERA_AHEAD_M = 20.0
 # Pre-computed to make calculations faster
 WORLD_WIDTH_HALF = WORLD_WIDTH / 2.0
 WORLD_LENGTH_HALF = WORLD_LENGTH / 2.0
+WORLD_SIZE = np.array((WORLD_LENGTH, WORLD_WIDTH))
 SCREEN_WIDTH_HALF = SCREEN_WIDTH // 2
 SCREEN_HEIGHT_HALF = SCREEN_HEIGHT // 2
 
@@ -56,6 +68,9 @@ MAX_NUM_TREES = 100
 # The vehicle always moves with constant forward airspeed. Its groundspeed varies based on the wind.
 VEHICLE_AIRSPEED = 30.0
 MAX_WINDSPEED_M_S = 20.0
+# A WindTrace is generated this many ticks at a time, enough for the longest flight through a world at the default
+# rate, since the zip's groundspeed is never less than VEHICLE_AIRSPEED - MAX_WINDSPEED_M_S.
+WIND_TRACE_TICKS = math.ceil(RECOVERY_X / (VEHICLE_AIRSPEED - MAX_WINDSPEED_M_S) / DT_SEC) + 1
 
 # Coordinates to keep generated delivery sites within.
 DELIVERY_SITE_X_BOUNDS = (100.0, WORLD_LENGTH - 100.0)  # Avoid distribution center
@@ -66,12 +81,53 @@ MIN_DELIVERY_DISTANCE = 100.0
 TREE_X_BOUNDS = (50.0, WORLD_LENGTH - 50.0)  # Avoid distribution center
 # Minimum distance from trees to delivery sites. Trees are allowed to overlap.
 MIN_TREE_DISTANCE = 10.0
+# World generation gives up on placing a site or tree after this many random positions that are too close to others.
+# A default world never needs more than a few dozen.
+MAX_PLACEMENT_ATTEMPTS = 10000
+# The independent random streams of a seed that a world's delivery sites, its trees and its WindTrace are drawn from,
+# see generate_world()
+SITES_STREAM = 0
+TREES_STREAM = 1
+WIND_STREAM = 2
+
+# The layout of one world in a WorldBank file: the seed it was generated from, the positions of its delivery sites and
+# trees (only the first num_trees are real), the initial wind speed and direction, and the state of the random number
+# generator right after drawing them, as random.Random.getstate() gives it (NaN standing in for a gauss_next of None).
+# Banks made with another layout or version can't be loaded.
+WORLD_BANK_VERSION = 1
+WORLD_BANK_DTYPE = np.dtype([("version", "<u2"),
+                             ("seed", "<i8"),
+                             ("delivery_sites", "<f8", (NUM_DELIVERY_SITES, 2)),
+                             ("num_trees", "<u4"),
+                             ("trees", "<f8", (MAX_NUM_TREES, 2)),
+                             ("wind", "<f8", (2,)),
+                             ("rng_state", "<u4", (625,)),
+                             ("gauss_next", "<f8")])
+# How many worlds each process generates at a time while building a bank
+WORLD_BANK_CHUNK = 64
+
+# Corridors are generated a chunk at a time as the zip flies along them, see CorridorSimulation. Only a window of a few
+# chunks exists at once. The zip flies in the first two chunks of the window, and the rest reach farther ahead than the
+# lidar can see.
+CORRIDOR_LENGTH = 200000.0
+CORRIDOR_CHUNK_LENGTH = 250.0
+CORRIDOR_WINDOW_CHUNKS = 4
 
 # The max distance the lidar works to. Any ray that travels farther will be reported as 0.
 LIDAR_MAX_DISTANCE = 255
 
-# The angles to sweep the lidar across.
-LIDAR_ANGLES = [(i - 15.0) * math.pi / 180 for i in range(0, 31)]  # -15 to +15 degrees, 1 degree steps.
+# The standard lidar sweeps LIDAR_BEAMS rays evenly across LIDAR_FOV_DEG degrees, centered straight ahead: -15 to +15
+# degrees in 1 degree steps. See Lidar for others.
+LIDAR_BEAMS = 31
+LIDAR_FOV_DEG = 30.0
+# Past this, a ray could pass close to two wrapped copies of the same circle, which the lidar math doesn't handle.
+LIDAR_MAX_FOV_DEG = 120.0
+# Below this many circles in range, casting the lidar in plain Python beats the NumPy overhead
+LIDAR_VECTORIZE_MIN_CIRCLES = 16
+# The grid spacing in meters of precomputed lidar tables, see LidarTable, and how many rows of the grid each process
+# fills at a time while building one.
+LIDAR_TABLE_RESOLUTION = 0.5
+LIDAR_TABLE_CHUNK_ROWS = 100
 
 DELIVERY_SITE_RADIUS = 5.0
 DELIVERY_SITE_LIDAR_RADIUS = 0.5
@@ -88,9 +144,47 @@ TREE_LIDAR_RADIUS = 3.0
 # wind_y [4 bytes]
 # recovery_x error [2 bytes]
 # recovery_y error [1 byte]
+TELEMETRY_HEADER_FORMAT = ">Hhffb"
 # 31 lidar samples [31 bytes]
-TELEMETRY_STRUCT = struct.Struct(">Hhffb31B")
-COMMAND_STRUCT = struct.Struct(">fB3s")
+TELEMETRY_STRUCT = struct.Struct(TELEMETRY_HEADER_FORMAT + "{}B".format(LIDAR_BEAMS))
+# A simulation with any other lidar, or that lets the pilot hold commands, first sends a handshake, once, before the
+# first telemetry:
+# magic [4 bytes]
+# telemetry version [1 byte]
+# number of lidar beams [2 bytes]
+# lidar field of view in degrees [4 bytes]
+# lidar range units [1 byte]
+# flags [1 byte]
+# Every telemetry frame after it is TELEMETRY_HEADER_FORMAT followed by one sample per beam, each an unsigned byte of
+# meters or, with LIDAR_DECIMETERS, an unsigned 2-byte integer of tenths of a meter. Pilots that only know
+# TELEMETRY_STRUCT (version 1) never see a handshake.
+HANDSHAKE_STRUCT = struct.Struct(">4sBHfBB")
+HANDSHAKE_MAGIC = b"ZIPT"
+TELEMETRY_VERSION = 2
+LIDAR_METERS = 0
+LIDAR_DECIMETERS = 1
+# Set in the handshake flags when the pilot may hold commands, see HOLD_COMMAND
+HANDSHAKE_HOLDS = 0x01
+# lateral_airspeed [4 bytes]
+# drop_package [1 byte]
+# hold_ticks [2 bytes]
+# hold_range [1 byte]
+COMMAND_STRUCT = struct.Struct(">fBHB")
+# Set in the drop_package byte to hold the command. The simulation then flies the same command for up to hold_ticks
+# more ticks without sending telemetry, stopping early as soon as a lidar object is less than hold_range meters ahead
+# (if hold_range isn't 0). The hold also ends with the flight. Only pilots whose handshake has HANDSHAKE_HOLDS set can
+# hold. For every other pilot, as for this flag's absence, any nonzero drop_package byte drops a package and the last
+# three bytes are padding.
+HOLD_COMMAND = 0x80
+
+# Batched messages let one pilot process fly many worlds per exchange. A batch is a header with the number of records,
+# followed by that many records. Each telemetry record is a world ID [4 bytes] followed by the fields of
+# TELEMETRY_STRUCT. The pilot answers with one command record per telemetry record, in the same order, each a world ID
+# followed by the fields of COMMAND_STRUCT. World IDs are never reused within a pilot process, and a world that's
+# missing from a batch has finished flying.
+BATCH_HEADER_STRUCT = struct.Struct(">I")
+BATCH_TELEMETRY_STRUCT = struct.Struct(">I" + TELEMETRY_STRUCT.format[1:])
+BATCH_COMMAND_STRUCT = struct.Struct(">I" + COMMAND_STRUCT.format[1:])
 
 # Return codes for why the simulation ended
 RECOVERED = 0
@@ -98,21 +192,122 @@ PARALANDED = 1
 CRASHED = 2
 SIM_QUIT = 3
 
+# Type tags for the rows of an EntityStore
+ENTITY_TAG = 0
+ZIP_TAG = 1
+TREE_TAG = 2
+DELIVERY_SITE_TAG = 3
+PACKAGE_TAG = 4
+LIDAR_TAG = 5
+
+
+# Images from the art directory, loaded the first time they're drawn
+_images = {}
+
 
 def load_image(name):
-    return pygame.image.load(os.path.join(os.path.dirname(__file__), "art", name))
+    """ Returns an image from the art directory, loading it the first time it's asked for. Once there's a display,
+    images are converted to its pixel format, which makes blitting them several times faster.
+    """
+    try:
+        return _images[name]
+    except KeyError:
+        import pygame
+        image = pygame.image.load(os.path.join(os.path.dirname(__file__), "art", name))
+        if pygame.display.get_surface() is not None:
+            image = image.convert_alpha()
+        _images[name] = image
+        return image
+
+
+class EntityStore():
+    """ Contiguous arrays holding the position, radius and type tag of every entity in a world.
+
+    Entities are views into a row of a store, so the hot parts of the simulation can work on whole columns at once
+    instead of looking up attributes object by object.
+    """
+    __slots__ = ["position", "radius", "tag", "size", "_rows_by_tag"]
+
+    def __init__(self, capacity=64):
+        self.position = np.zeros((capacity, 2))
+        self.radius = np.zeros(capacity)
+        self.tag = np.zeros(capacity, dtype=np.int8)
+        self.size = 0
+        self._rows_by_tag = {}
+
+    def add(self, position, radius, tag):
+        """ Appends a row and returns its index. """
+        if self.size == len(self.radius):
+            capacity = 2 * self.size
+            self.position = np.resize(self.position, (capacity, 2))
+            self.radius = np.resize(self.radius, capacity)
+            self.tag = np.resize(self.tag, capacity)
+        row = self.size
+        self.position[row] = position
+        self.radius[row] = radius
+        self.tag[row] = tag
+        self.size += 1
+        self._rows_by_tag.pop(tag, None)
+        return row
+
+    def rows(self, tag):
+        """ The rows with the tag, in the order they were added. This is a slice when they're contiguous, which they
+        are for everything a world generates in one go, so indexing with it gives a view instead of a copy.
+        """
+        try:
+            return self._rows_by_tag[tag]
+        except KeyError:
+            rows = np.flatnonzero(self.tag[:self.size] == tag)
+            if len(rows) == 0 or rows[-1] - rows[0] + 1 == len(rows):
+                rows = slice(rows[0], rows[-1] + 1) if len(rows) else slice(0, 0)
+            self._rows_by_tag[tag] = rows
+            return rows
+
+    def sweep(self, rows, start, delta):
+        """ Which of the circles in rows the segment from start to start + delta passes through. The segment must be
+        shorter than half the world in each axis, so that there's only one way around to each circle.
+        """
+        delta = np.array(delta)
+        middle = np.array(start) + 0.5 * delta
+        # Circle centers relative to the middle of the segment, taking the shorter way around the world
+        center = self.position[rows] - middle
+        center += WORLD_SIZE / 2.0
+        center %= WORLD_SIZE
+        center -= WORLD_SIZE / 2.0
+        # The point on the segment closest to each center, as a fraction of the way from one end to the other
+        length_squared = delta.dot(delta)
+        t = np.clip(center.dot(delta) / length_squared, -0.5, 0.5) if length_squared > 0.0 else np.zeros(len(center))
+        center -= t[:, np.newaxis] * delta
+        center *= center
+        radius = self.radius[rows]
+        return center[:, 0] + center[:, 1] < radius * radius
 
 
 class Entity():
-    __slots__ = ["position"]
+    __slots__ = ["_store", "_row"]
+    _tag = ENTITY_TAG
 
-    def __init__(self, position):
+    def __init__(self, position, store=None, radius=0.0, tag=None):
+        # Entities that don't belong to a world, like the camera, get a store of their own.
+        self._store = EntityStore(capacity=1) if store is None else store
         x, y = position
-        self.position = (x % WORLD_LENGTH, y % WORLD_WIDTH)
+        self._row = self._store.add((x % WORLD_LENGTH, y % WORLD_WIDTH), radius, self._tag if tag is None else tag)
+
+    @property
+    def position(self):
+        x, y = self._store.position[self._row].tolist()
+        return (x, y)
+
+    @position.setter
+    def position(self, position):
+        self._store.position[self._row] = position
 
     def move(self, delta):
         v_x, v_y = delta
-        self.position = ((self.position[0] + v_x) % WORLD_LENGTH, (self.position[1] + v_y) % WORLD_WIDTH)
+        store_position = self._store.position
+        row = self._row
+        x, y = store_position[row].tolist()
+        store_position[row] = ((x + v_x) % WORLD_LENGTH, (y + v_y) % WORLD_WIDTH)
 
     def distance_to(self, position):
         delta_x = abs(self.position[0] - position[0])
@@ -149,12 +344,13 @@ class Camera(Entity):
 
 class Package(Entity):
     __slots__ = ["_velocity", "_fall_duration"]
+    _tag = PACKAGE_TAG
 
-    _parachute_image = load_image("package_parachute.png")
-    _package_image = load_image("package.png")
+    _parachute_image = "package_parachute.png"
+    _package_image = "package.png"
 
-    def __init__(self, position, velocity, fall_duration=PACKAGE_FALL_SEC):
-        super().__init__(position)
+    def __init__(self, position, velocity, fall_duration=PACKAGE_FALL_SEC, store=None):
+        super().__init__(position, store)
         self._velocity = velocity
         self._fall_duration = fall_duration
 
@@ -163,38 +359,50 @@ class Package(Entity):
         self._fall_duration -= dt
         self.move((dt * self._velocity[0], dt * self._velocity[1]))
 
+    def landing_position(self):
+        """ Where the package will come to rest, without disturbing its current state. """
+        landed = Package(self.position, self._velocity, self._fall_duration)
+        landed.update(PACKAGE_FALL_SEC)
+        return landed.position
+
     def draw(self, camera, surface):
         for projected_pos in camera.project(self.position):
             if self._fall_duration > 0:
-                surface.blit(self._parachute_image, (projected_pos[0] - 4, projected_pos[1] - 4))
+                surface.blit(load_image(self._parachute_image), (projected_pos[0] - 4, projected_pos[1] - 4))
 
             else:
-                surface.blit(self._package_image, (projected_pos[0] - 4, projected_pos[1] - 4))
+                surface.blit(load_image(self._package_image), (projected_pos[0] - 4, projected_pos[1] - 4))
 
 
 class Circle(Entity):
-    __slots__ = ["radius"]
+    __slots__ = []
 
-    def __init__(self, position, radius):
-        super().__init__(position)
-        self.radius = radius
+    def __init__(self, position, radius, store=None, tag=None):
+        super().__init__(position, store, radius, tag)
+
+    @property
+    def radius(self):
+        return self._store.radius[self._row].item()
 
     def contains(self, position):
-        delta_x = abs(self.position[0] - position[0])
-        delta_y = abs(self.position[1] - position[1])
+        self_x, self_y = self.position
+        delta_x = abs(self_x - position[0])
+        delta_y = abs(self_y - position[1])
         if delta_x > WORLD_LENGTH_HALF:
             delta_x = WORLD_LENGTH - delta_x
         if delta_y > WORLD_WIDTH_HALF:
             delta_y = WORLD_WIDTH - delta_y
-        return delta_x * delta_x + delta_y * delta_y < self.radius * self.radius
+        radius = self.radius
+        return delta_x * delta_x + delta_y * delta_y < radius * radius
 
 
 class Zip(Circle):
     __slots__ = []
-    _image = load_image("zip.png")
+    _tag = ZIP_TAG
+    _image = "zip.png"
 
-    def __init__(self):
-        super().__init__(position=(0.0, 0.0), radius=1.6)
+    def __init__(self, store=None):
+        super().__init__(position=(0.0, 0.0), radius=1.6, store=store)
 
     def get_velocity(self, lateral_airspeed, windspeed_vector):
         return (VEHICLE_AIRSPEED + windspeed_vector[0], lateral_airspeed + windspeed_vector[1])
@@ -205,65 +413,207 @@ class Zip(Circle):
 
     def draw(self, camera, surface):
         for projected_pos in camera.project(self.position):
-            surface.blit(self._image, (projected_pos[0] - 16, projected_pos[1] - 16))
+            surface.blit(load_image(self._image), (projected_pos[0] - 16, projected_pos[1] - 16))
 
 
 class DeliverySite(Circle):
     __slots__ = []
-    _image = load_image("delivery_site.png")
+    _tag = DELIVERY_SITE_TAG
+    _image = "delivery_site.png"
 
-    def __init__(self, position):
-        super().__init__(position, radius=DELIVERY_SITE_RADIUS)
+    def __init__(self, position, store=None):
+        super().__init__(position, radius=DELIVERY_SITE_RADIUS, store=store)
 
     def draw(self, camera, surface):
         for projected_pos in camera.project(self.position):
-            surface.blit(self._image, (projected_pos[0] - 64, projected_pos[1] - 64))
+            surface.blit(load_image(self._image), (projected_pos[0] - 64, projected_pos[1] - 64))
 
     def make_lidar_object(self):
-        return Circle(self.position, radius=DELIVERY_SITE_LIDAR_RADIUS)
+        return Circle(self.position, radius=DELIVERY_SITE_LIDAR_RADIUS, store=self._store, tag=LIDAR_TAG)
 
 
 class Tree(Circle):
     __slots__ = []
-    _image = load_image("tree.png")
+    _tag = TREE_TAG
+    _image = "tree.png"
 
-    def __init__(self, position):
-        super().__init__(position, radius=TREE_COLLISION_RADIUS)
+    def __init__(self, position, store=None):
+        super().__init__(position, radius=TREE_COLLISION_RADIUS, store=store)
 
     def draw(self, camera, surface):
         for projected_pos in camera.project(self.position):
-            surface.blit(self._image, (projected_pos[0] - 32, projected_pos[1] - 32))
+            surface.blit(load_image(self._image), (projected_pos[0] - 32, projected_pos[1] - 32))
 
     def make_lidar_object(self):
-        return Circle(self.position, radius=TREE_LIDAR_RADIUS)
+        return Circle(self.position, radius=TREE_LIDAR_RADIUS, store=self._store, tag=LIDAR_TAG)
+
+
+def wind_sigmas(dt):
+    """ The standard deviations of the random changes in wind speed and direction over a tick of dt. The wind is a
+    random walk, so they scale with the square root of dt, from their values at the default rate. That way the wind
+    varies as much per second at any rate.
+    """
+    scale = math.sqrt(dt / DT_SEC)
+    return DT_SEC * 10 * scale, DT_SEC * scale
 
 
 class Wind():
-    __slots__ = ["_speed", "_direction"]
+    __slots__ = ["_speed", "_direction", "_rng", "vector"]
 
-    def __init__(self):
-        self._speed = random.uniform(0.0, MAX_WINDSPEED_M_S)
-        self._direction = random.uniform(0.0, 2 * math.pi)
+    def __init__(self, rng=random, speed=None, direction=None):
+        # The initial wind is random, unless it's given
+        self._rng = rng
+        self._speed = rng.uniform(0.0, MAX_WINDSPEED_M_S) if speed is None else speed
+        self._direction = rng.uniform(0.0, 2 * math.pi) if direction is None else direction
+        self._update_vector()
 
     def update(self, dt):
-        # TODO: Scale sigma?
-        self._speed = max(0.0, min(MAX_WINDSPEED_M_S, self._speed + random.gauss(0.0, dt * 10)))
-        self._direction = (self._direction + random.gauss(0.0, dt)) % (2 * math.pi)
+        speed_sigma, direction_sigma = wind_sigmas(dt)
+        self._speed = max(0.0, min(MAX_WINDSPEED_M_S, self._speed + self._rng.gauss(0.0, speed_sigma)))
+        self._direction = (self._direction + self._rng.gauss(0.0, direction_sigma)) % (2 * math.pi)
+        self._update_vector()
+
+    def _update_vector(self):
+        # The vector is read several times per tick, so it's only computed when the wind changes.
+        self.vector = (self._speed * math.cos(self._direction), self._speed * math.sin(self._direction))
+
+
+class WindTrace():
+    """ Wind that changes the way Wind does, with the same clamping of the speed and wrapping of the direction, but
+    drawn ahead of time from a NumPy generator of its own instead of two random.gauss calls per tick. The same seed
+    gives the same wind whatever world it blows through, so worlds and winds can be paired at will.
+
+    The trace is generated as a (WIND_TRACE_TICKS, 2) array of wind vectors at a time, for the dt it's updated with.
+    Updating it only moves on to the next row, and only the block being flown through is kept, so a trace takes the
+    same memory however long the flight. Blocks are never changed once generated, so copies share them.
+    """
+    __slots__ = ["_generator", "_dt", "_speed", "_direction", "_block", "_offset", "vector"]
+
+    def __init__(self, seed=None):
+        self._generator = np.random.Generator(np.random.PCG64(np.random.SeedSequence(seed, spawn_key=(WIND_STREAM,))))
+        self._dt = None
+        # The speed and direction at the last tick of the block
+        self._speed = float(self._generator.uniform(0.0, MAX_WINDSPEED_M_S))
+        self._direction = float(self._generator.uniform(0.0, 2 * math.pi))
+        # The wind vectors of the block, and the row of the current tick. The first block is just the initial wind.
+        self._block = np.array([[self._speed * math.cos(self._direction), self._speed * math.sin(self._direction)]])
+        self._block.flags.writeable = False
+        self._offset = 0
+        self.vector = tuple(self._block[0].tolist())
+
+    def __deepcopy__(self, memo):
+        trace = WindTrace.__new__(WindTrace)
+        for name in ("_dt", "_speed", "_direction", "_block", "_offset", "vector"):
+            setattr(trace, name, getattr(self, name))
+        trace._generator = copy.deepcopy(self._generator, memo)
+        return trace
 
-    @property
-    def vector(self):
-        return (self._speed * math.cos(self._direction), self._speed * math.sin(self._direction))
+    def update(self, dt):
+        if dt != self._dt:
+            if self._dt is not None:
+                raise ValueError("A wind trace can't change its dt once it's been updated")
+            self._dt = dt
+        self._offset += 1
+        if self._offset == len(self._block):
+            self._next_block()
+        self.vector = tuple(self._block[self._offset].tolist())
+
+    def _next_block(self):
+        """ Replaces the block with the next WIND_TRACE_TICKS ticks of the trace. """
+        # The same deviations Wind.update draws, in the same order
+        noise = self._generator.standard_normal((WIND_TRACE_TICKS, 2))
+        noise *= wind_sigmas(self._dt)
+        # Clamping makes every speed depend on the one before, so the speeds can't be a cumulative sum. They're
+        # accumulated with the same arithmetic as Wind.update instead. Wrapping the direction can wait until the end.
+        speeds = np.array(list(itertools.accumulate(
+            noise[:, 0].tolist(), lambda speed, delta: max(0.0, min(MAX_WINDSPEED_M_S, speed + delta)),
+            initial=self._speed))[1:])
+        directions = (self._direction + np.cumsum(noise[:, 1])) % (2 * math.pi)
+        self._speed = speeds[-1].item()
+        self._direction = directions[-1].item()
+        self._block = np.column_stack((speeds * np.cos(directions), speeds * np.sin(directions)))
+        self._block.flags.writeable = False
+        self._offset = 0
 
 
 class Terrain():
     __slots__ = []
-    _image = load_image("terrain.png")
+    _image = "terrain.png"
 
     def draw(self, camera, surface):
         # There's probably a better way to do this, but as long as it works...
         for x in range(0, int(WORLD_LENGTH), 100):
             for projected_pos in camera.project((x, 0.0)):
-                surface.blit(self._image, (projected_pos[0] - 250, projected_pos[1] - 1000))
+                surface.blit(load_image(self._image), (projected_pos[0] - 250, projected_pos[1] - 1000))
+
+
+class Lidar():
+    """ The rays a lidar casts and how it reports their ranges: beams rays spread evenly over fov degrees, centered
+    straight ahead, with ranges in whole meters or, with decimeters, tenths of a meter. The default is the standard
+    lidar every pilot knows. Lidars are immutable, so simulations can share one.
+    """
+    __slots__ = ["beams", "fov", "decimeters", "angles", "sin", "neg_cos", "sin_list", "neg_cos_list", "tan",
+                 "max_tan", "max_sec", "units_per_meter", "max_range", "cutoff", "vectorize_min_circles",
+                 "telemetry_struct"]
+
+    def __init__(self, beams=LIDAR_BEAMS, fov=LIDAR_FOV_DEG, decimeters=False):
+        if beams < 1 or beams > 0xFFFF:
+            raise ValueError("A lidar needs from 1 to 65535 beams, not {}".format(beams))
+        if not 0.0 <= fov <= LIDAR_MAX_FOV_DEG:
+            raise ValueError("A lidar's field of view must be from 0 to {} degrees, not {}".format(
+                LIDAR_MAX_FOV_DEG, fov))
+        self.beams = beams
+        self.fov = float(fov)
+        self.decimeters = decimeters
+        step = self.fov / (beams - 1) if beams > 1 else 0.0
+        self.angles = [(i - (beams - 1) / 2.0) * step * math.pi / 180 for i in range(beams)]
+        # The a and b line coefficients of every ray, see cast_lidar_ray. They're computed with the math module so that
+        # the vectorized lidar gets bit-for-bit the same values.
+        self.sin = np.array([math.sin(angle) for angle in self.angles])
+        self.neg_cos = np.array([-math.cos(angle) for angle in self.angles])
+        # The same as plain lists, which are faster to index one at a time
+        self.sin_list = self.sin.tolist()
+        self.neg_cos_list = self.neg_cos.tolist()
+        # A ray at angle theta passes within r of a point (x, y) when |x * tan(theta) - y| < r / cos(theta). The
+        # tangents are in increasing order, so the rays that can hit a circle can be found by bisection.
+        self.tan = [math.tan(angle) for angle in self.angles]
+        self.max_tan = max(abs(t) for t in self.tan)
+        self.max_sec = max(1.0 / math.cos(angle) for angle in self.angles)
+        self.units_per_meter = 10 if decimeters else 1
+        # Ranges beyond max_range units are reported as 0. Nothing with its near edge at the cutoff or farther can
+        # return a range, with a little to spare for rounding.
+        self.max_range = LIDAR_MAX_DISTANCE * self.units_per_meter
+        self.cutoff = (self.max_range + 1) / self.units_per_meter
+        # Below this many circles in range, casting the lidar in plain Python beats the NumPy overhead. Python's cost
+        # grows with the number of rays each circle covers, NumPy's hardly does.
+        self.vectorize_min_circles = max(1, round(LIDAR_VECTORIZE_MIN_CIRCLES * LIDAR_BEAMS / beams))
+        self.telemetry_struct = struct.Struct(TELEMETRY_HEADER_FORMAT +
+                                              "{}{}".format(beams, "H" if decimeters else "B"))
+
+    def __reduce__(self):
+        return Lidar, (self.beams, self.fov, self.decimeters)
+
+    def __deepcopy__(self, memo):
+        return self
+
+    @property
+    def standard(self):
+        """ Whether this is the standard lidar, whose telemetry is TELEMETRY_STRUCT without a handshake. """
+        return (self.beams, self.fov, self.decimeters) == (LIDAR_BEAMS, LIDAR_FOV_DEG, False)
+
+    def handshake(self, holds=False):
+        """ The fields of the HANDSHAKE_STRUCT that describes this lidar's telemetry, and whether the pilot may hold
+        commands.
+        """
+        return (HANDSHAKE_MAGIC, TELEMETRY_VERSION, self.beams, self.fov,
+                LIDAR_DECIMETERS if self.decimeters else LIDAR_METERS, HANDSHAKE_HOLDS if holds else 0)
+
+
+DEFAULT_LIDAR = Lidar()
+# The standard lidar's rays, for code that only ever casts it
+LIDAR_ANGLES = DEFAULT_LIDAR.angles
+LIDAR_SIN = DEFAULT_LIDAR.sin
+LIDAR_NEG_COS = DEFAULT_LIDAR.neg_cos
 
 
 def cast_lidar_ray(angle, circles):
@@ -299,35 +649,1309 @@ def cast_lidar_ray(angle, circles):
     return distance if distance <= LIDAR_MAX_DISTANCE else 0
 
 
-def cast_lidar(start_pos, objects):
+def cast_lidar_circles(circles, lidar=DEFAULT_LIDAR):
+    """ cast_lidar_ray for every angle of the lidar at once, as one (rays, circles) array computation.
+
+    circles is an (N, 3) array of (x, y, radius), in the vehicle's frame, of the circles ahead of the vehicle. Returns
+    the range of every ray as a list, with exactly the values cast_lidar_ray would give (in the lidar's units).
+    """
+    x = circles[:, 0]
+    y = circles[:, 1]
+    radius = circles[:, 2]
+    if np.any(x * x + y * y <= radius * radius):
+        return [0] * lidar.beams  # We're inside an object. Pretend that the lidar is blind.
+    # Circles whose near edge is past the cutoff can't produce a return.
+    reachable = x - radius < lidar.cutoff
+    x = x[reachable]
+    y = y[reachable]
+    radius = radius[reachable]
+
+    # The arithmetic is written in the same order as cast_lidar_ray so that the rounded results agree with it.
+    a = lidar.sin[:, np.newaxis]
+    b = lidar.neg_cos[:, np.newaxis]
+    signed_c = -(a * x + b * y)
+    num_wraps = np.round(signed_c / (b * WORLD_WIDTH))
+    signed_c -= num_wraps * b * WORLD_WIDTH
+
+    # Only a few rays hit anything, so finish the intersection math on just those.
+    ray, column = np.nonzero(np.abs(signed_c) < radius)
+    a = lidar.sin[ray]
+    b = lidar.neg_cos[ray]
+    signed_c = signed_c[ray, column]
+    radius = radius[column]
+    gnarly_math = np.sqrt(radius * radius - signed_c * signed_c)
+    hit_x = a * signed_c + b * gnarly_math + x[column]
+    hit_y = b * signed_c - a * gnarly_math + y[column] + num_wraps[ray, column] * WORLD_WIDTH
+    distance = np.full(lidar.beams, np.inf)
+    np.minimum.at(distance, ray, np.sqrt(hit_x * hit_x + hit_y * hit_y))
+
+    distance = np.round(distance * lidar.units_per_meter)
+    distance[~(distance <= lidar.max_range)] = 0
+    return distance.astype(int).tolist()
+
+
+def cast_lidar_binned(circles, lidar=DEFAULT_LIDAR):
+    """ cast_lidar_ray for every angle of the lidar at once, testing each circle only against the few rays pointing
+    within its angular radius of it, rather than every ray.
+
+    circles is a sequence of (x, y, radius) tuples, in the vehicle's frame, of the circles ahead of the vehicle. Returns
+    the range of every ray as a list, with exactly the values cast_lidar_circles would give. It's fastest with the
+    nearest circles first, as LidarIndex passes them, since circles behind what a ray already hit are skipped.
+    """
+    sin = lidar.sin_list
+    neg_cos = lidar.neg_cos_list
+    tan = lidar.tan
+    max_tan = lidar.max_tan
+    max_sec = lidar.max_sec
+    cutoff = lidar.cutoff
+    nearest = [LIDAR_MAX_DISTANCE + 1] * lidar.beams
+    for x, y, r in circles:
+        if x * x + y * y <= r * r:
+            return [0] * lidar.beams  # We're inside the object. Pretend that the lidar is blind.
+        if x - r >= cutoff:
+            continue  # Too far away to return a range
+        # Because of wraparound, the world repeats every WORLD_WIDTH in y. Copies of the circle are spaced far enough
+        # apart that a ray can only pass within r of the one closest to it, which is the one cast_lidar_ray picks with
+        # num_wraps. So each ray can be tested against each copy in the field of view directly, without working out
+        # the number of wraps. The extra micrometer of reach covers rounding.
+        reach = r * max_sec + 1e-6
+        # Copies are at least half a world width out, so near circles only need the middle one. For the standard
+        # lidar, nothing is ever far enough ahead to see more than one copy to either side.
+        wraps = int((x * max_tan + reach) / WORLD_WIDTH + 0.5)
+        for num_wraps in range(-wraps, wraps + 1):
+            copy_y = y + num_wraps * WORLD_WIDTH
+            for i in range(bisect.bisect_left(tan, (copy_y - reach) / x),
+                           bisect.bisect_right(tan, (copy_y + reach) / x)):
+                if x - r >= nearest[i]:
+                    continue  # Every point of the circle is farther than what the ray already hit
+                # The same math as cast_lidar_ray
+                a = sin[i]
+                b = neg_cos[i]
+                signed_c = -(a * x + b * y) - num_wraps * b * WORLD_WIDTH
+                if abs(signed_c) < r:
+                    gnarly_math = math.sqrt(r * r - signed_c * signed_c)
+                    hit_x = a * signed_c + b * gnarly_math + x
+                    hit_y = b * signed_c - a * gnarly_math + y + num_wraps * WORLD_WIDTH
+                    d = math.sqrt(hit_x * hit_x + hit_y * hit_y)
+                    if d < nearest[i]:
+                        nearest[i] = d
+    units_per_meter = lidar.units_per_meter
+    max_range = lidar.max_range
+    return [d if d <= max_range else 0 for d in [round(n * units_per_meter) for n in nearest]]
+
+
+def cast_lidar(start_pos, objects, lidar=DEFAULT_LIDAR):
     # Remove objects that are behind the vehicle, and shift the positions to be in the vehicle's frame
-    relative_objects = [(o.position[0] - start_pos[0],
-                         (o.position[1] - start_pos[1] + WORLD_WIDTH_HALF) % WORLD_WIDTH - WORLD_WIDTH_HALF,
-                         o.radius) for o in objects if o.position[0] > start_pos[0]]
-    return [cast_lidar_ray(angle, relative_objects) for angle in LIDAR_ANGLES]
+    relative_objects = np.array([(o.position[0] - start_pos[0],
+                                  (o.position[1] - start_pos[1] + WORLD_WIDTH_HALF) % WORLD_WIDTH - WORLD_WIDTH_HALF,
+                                  o.radius) for o in objects if o.position[0] > start_pos[0]]).reshape(-1, 3)
+    if len(relative_objects) < lidar.vectorize_min_circles:
+        return cast_lidar_binned(relative_objects.tolist(), lidar)
+    return cast_lidar_circles(relative_objects, lidar)
+
+
+class LidarIndex():
+    """ A world's lidar objects sorted by x, so that a lidar cast only looks at the few that are close enough ahead of
+    the vehicle to matter instead of every object in the world. The objects mustn't move once the index is built.
+
+    Like cast_lidar, only objects with a greater x than the vehicle count as ahead of it. The world wraps in x, but the
+    lidar doesn't see across the seam.
+    """
+    __slots__ = ["_x", "_circles", "_circle_list", "_max_radius"]
+
+    def __init__(self, store, rows):
+        position = store.position[rows]
+        radius = store.radius[rows]
+        order = np.argsort(position[:, 0], kind="stable")
+        self._circles = np.column_stack((position[order], radius[order]))
+        # Plain lists for bisect and for casting a few circles at a time in Python
+        self._x = self._circles[:, 0].tolist()
+        self._circle_list = [tuple(c) for c in self._circles.tolist()]
+        self._max_radius = radius.max(initial=0.0)
+
+    def span(self, start_x, distance):
+        """ The range of indices of the circles whose centers are ahead of start_x by less than distance. """
+        return bisect.bisect_right(self._x, start_x), bisect.bisect_left(self._x, start_x + distance)
+
+    def window(self, start_x, distance):
+        """ An (N, 3) view of the (x, y, radius) of the circles whose centers are ahead of start_x by less than
+        distance, sorted by x.
+        """
+        first, last = self.span(start_x, distance)
+        return self._circles[first:last]
+
+    def cast(self, start_pos, lidar=DEFAULT_LIDAR):
+        """ The same as cast_lidar, from start_pos. """
+        start_x, start_y = start_pos
+        # Nothing farther ahead than this can contain the vehicle or return a range up to LIDAR_MAX_DISTANCE. The
+        # extra meter covers rounding, like the initial distance in cast_lidar_ray.
+        first, last = self.span(start_x, LIDAR_MAX_DISTANCE + 1 + self._max_radius)
+        if last - first < lidar.vectorize_min_circles:
+            return cast_lidar_binned([(x - start_x,
+                                       (y - start_y + WORLD_WIDTH_HALF) % WORLD_WIDTH - WORLD_WIDTH_HALF, r)
+                                      for x, y, r in self._circle_list[first:last]], lidar)
+        circles = self._circles[first:last].copy()
+        circles[:, 0] -= start_x
+        circles[:, 1] -= start_y
+        circles[:, 1] += WORLD_WIDTH_HALF
+        circles[:, 1] %= WORLD_WIDTH
+        circles[:, 1] -= WORLD_WIDTH_HALF
+        return cast_lidar_circles(circles, lidar)
+
+    def clear_ahead(self, start_x, distance):
+        """ Whether every circle ahead of start_x is at least distance ahead of it. """
+        circles = self.window(start_x, distance + 1 + self._max_radius)
+        return not np.any(circles[:, 0] - circles[:, 2] < start_x + distance)
+
+    def digest(self):
+        """ A hex digest of the indexed circles, which identifies everything the lidar can see in the world. """
+        return hashlib.sha1(self._circles.tobytes()).hexdigest()
+
+
+class CollisionIndex():
+    """ A world's collision circles sorted by x, the broad phase of collision checks: only the few circles close enough
+    in x to the zip get the exact narrow test, so the cost of a check doesn't grow with the number of trees. The
+    circles mustn't move once the index is built.
+    """
+    __slots__ = ["_rows", "_x", "_circles", "_max_radius"]
+
+    def __init__(self, store, rows):
+        rows = np.arange(store.size)[rows]
+        x = store.position[rows, 0]
+        order = np.argsort(x, kind="stable")
+        self._rows = rows[order]
+        self._x = x[order].tolist()
+        self._circles = [(x, y, r) for (x, y), r in zip(store.position[self._rows].tolist(),
+                                                        store.radius[self._rows].tolist())]
+        self._max_radius = store.radius[rows].max(initial=0.0)
+
+    def _spans(self, x, distance):
+        """ The ranges of indices of the circles that could be within distance of x in x, around the world. """
+        reach = distance + self._max_radius
+        spans = [(bisect.bisect_left(self._x, x - reach), bisect.bisect_right(self._x, x + reach))]
+        # Near the ends of the world, the circles at the other end are close too
+        if x - reach < 0.0:
+            spans.append((bisect.bisect_left(self._x, x - reach + WORLD_LENGTH), len(self._x)))
+        if x + reach > WORLD_LENGTH:
+            spans.append((0, bisect.bisect_right(self._x, x + reach - WORLD_LENGTH)))
+        return spans
+
+    def rows_near(self, x, distance):
+        """ The store rows of every circle that could come within distance of x in x. """
+        return np.concatenate([self._rows[first:last] for first, last in self._spans(x, distance)])
+
+    def contains(self, position):
+        """ Whether any circle contains the position, with the same arithmetic as Circle.contains. """
+        position_x, position_y = position
+        for first, last in self._spans(position_x, 0.0):
+            for x, y, r in self._circles[first:last]:
+                delta_x = abs(x - position_x)
+                delta_y = abs(y - position_y)
+                # Wrap around the world, the shorter way around
+                delta_x = min(delta_x, WORLD_LENGTH - delta_x)
+                delta_y = min(delta_y, WORLD_WIDTH - delta_y)
+                if delta_x * delta_x + delta_y * delta_y < r * r:
+                    return True
+        return False
+
+
+class LidarTable():
+    """ The lidar ranges of one world, precomputed at every point of a grid over the whole world and memory-mapped
+    from a .npy file. The lidar only depends on where the vehicle is, so a cast becomes a lookup of the nearest grid
+    point. That makes the ranges approximate, off by up to half a grid cell in position. Positions off the grid are
+    cast exactly.
+
+    Tables are saved in a directory under the digest of the world's lidar objects and the lidar, so flying the same
+    seed again, with any pilot, reuses the table. Tables are read-only, so simulations can share one.
+    """
+    __slots__ = ["_ranges", "_resolution", "_lidar_index", "_lidar"]
+
+    def __init__(self, ranges, resolution, lidar_index, lidar=DEFAULT_LIDAR):
+        self._ranges = ranges
+        self._resolution = resolution
+        self._lidar_index = lidar_index
+        self._lidar = lidar
+
+    def __deepcopy__(self, memo):
+        return self
+
+    @staticmethod
+    def path(directory, lidar_index, lidar=DEFAULT_LIDAR, resolution=LIDAR_TABLE_RESOLUTION):
+        """ Where the table for the world and lidar is kept in directory. """
+        return os.path.join(directory, "lidar-{}-{}x{}{}-{}.npy".format(
+            lidar_index.digest()[:16], lidar.beams, lidar.fov, "dm" if lidar.decimeters else "m", resolution))
+
+    @classmethod
+    def load(cls, directory, lidar_index, lidar=DEFAULT_LIDAR, resolution=LIDAR_TABLE_RESOLUTION, processes=1):
+        """ Opens the table for the world and lidar saved in directory, building and saving it first if there isn't
+        one yet. See build() for processes.
+        """
+        path = cls.path(directory, lidar_index, lidar, resolution)
+        if not os.path.exists(path):
+            os.makedirs(directory, exist_ok=True)
+            cls.build(path, lidar_index, lidar, resolution, processes)
+        # A plain array view of the mapping is quicker to index than the memmap itself
+        return cls(np.load(path, mmap_mode="r").view(np.ndarray), resolution, lidar_index, lidar)
+
+    @staticmethod
+    def build(path, lidar_index, lidar=DEFAULT_LIDAR, resolution=LIDAR_TABLE_RESOLUTION, processes=1):
+        """ Casts the lidar at every grid point and saves the ranges to path. With processes other than 1, the rows
+        are filled by that many forked processes at once (by default one per CPU), see fork_map. The file only
+        appears once it's complete, so tables being built concurrently by several processes don't clash.
+        """
+        shape = (round(WORLD_LENGTH / resolution), round(WORLD_WIDTH / resolution), lidar.beams)
+        temp_path = "{}.{}.tmp.npy".format(path, os.getpid())
+        np.lib.format.open_memmap(temp_path, mode="w+", dtype=np.uint16 if lidar.decimeters else np.uint8,
+                                  shape=shape).flush()
+
+        def fill(rows):
+            ranges = np.load(temp_path, mmap_mode="r+")
+            for i in range(*rows):
+                ranges[i] = [lidar_index.cast((i * resolution, j * resolution), lidar) for j in range(shape[1])]
+            ranges.flush()
+
+        chunks = [(first, min(first + LIDAR_TABLE_CHUNK_ROWS, shape[0]))
+                  for first in range(0, shape[0], LIDAR_TABLE_CHUNK_ROWS)]
+        try:
+            if processes == 1:
+                for rows in chunks:
+                    fill(rows)
+            else:
+                fork_map(fill, chunks, processes)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def cast(self, start_pos):
+        """ The lidar ranges at the nearest grid point to start_pos, or cast exactly if it's off the grid. """
+        x, y = start_pos
+        row = round(x / self._resolution)
+        if not 0 <= row < len(self._ranges):
+            return self._lidar_index.cast(start_pos, self._lidar)
+        ranges = self._ranges[row]
+        # The lidar sees the same thing from every copy of the world in y
+        return ranges[round(y % WORLD_WIDTH / self._resolution) % len(ranges)].tolist()
+
+
+class SpacingGrid():
+    """ A spatial hash of points in the world, for checking that a new point is at least min_distance from all of them
+    by measuring only the points nearby. The world is a long, narrow corridor, so points are binned by x alone, into
+    cells at least min_distance long, and nothing outside the neighboring cells can be closer than that. Distances wrap
+    around the world, exactly as Entity.distance_to measures them.
+    """
+    __slots__ = ["_min_distance", "_columns", "_cell_length", "_cells"]
+
+    def __init__(self, min_distance):
+        self._min_distance = min_distance
+        self._columns = max(1, int(WORLD_LENGTH // min_distance))
+        self._cell_length = WORLD_LENGTH / self._columns
+        self._cells = [[] for _ in range(self._columns)]
+
+    def _column(self, x):
+        return int(x % WORLD_LENGTH / self._cell_length) % self._columns
+
+    def add(self, position):
+        self._cells[self._column(position[0])].append(position)
+
+    def clear_of(self, position):
+        """ Whether position is at least min_distance from every point, the same as taking the minimum distance_to. """
+        x, y = position
+        column = self._column(x)
+        cells = self._cells
+        for c in {(column - 1) % self._columns, column, (column + 1) % self._columns}:
+            for point_x, point_y in cells[c]:
+                delta_x = abs(point_x - x)
+                delta_y = abs(point_y - y)
+                if delta_x > WORLD_LENGTH_HALF:
+                    delta_x = WORLD_LENGTH - delta_x
+                if delta_y > WORLD_WIDTH_HALF:
+                    delta_y = WORLD_WIDTH - delta_y
+                if math.sqrt(delta_x * delta_x + delta_y * delta_y) < self._min_distance:
+                    return False
+        return True
+
+
+def place(sample, grid, what):
+    """ Draws positions from sample() until one is clear of every point in grid, and returns it. """
+    for _ in range(MAX_PLACEMENT_ATTEMPTS):
+        position = sample()
+        if grid.clear_of(position):
+            return position
+    raise RuntimeError("Couldn't place a {} clear of the others in {} tries".format(what, MAX_PLACEMENT_ATTEMPTS))
+
+
+def generate_delivery_sites(rng=random, store=None):
+    """ Randomly generate delivery sites that aren't too close to each other. """
+    def sample():
+        # Round the position to the nearest tenth of a meter. This keeps the sprites from jumping around while
+        # drawing due to floating point round-off to the nearest pixel.
+        return (round(rng.uniform(*DELIVERY_SITE_X_BOUNDS) % WORLD_LENGTH, 1),
+                round(rng.uniform(*DELIVERY_SITE_Y_BOUNDS) % WORLD_WIDTH, 1))
+
+    delivery_sites = []
+    grid = SpacingGrid(MIN_DELIVERY_DISTANCE)
+    for _ in range(NUM_DELIVERY_SITES):
+        delivery_sites.append(DeliverySite(place(sample, grid, "delivery site"), store))
+        grid.add(delivery_sites[-1].position)
+    return delivery_sites
+
+
+def generate_trees(delivery_sites, rng=random, store=None, num_trees=None):
+    """ Randomly generate trees that aren't too close to delivery sites. Unless num_trees is given, the number of trees
+    is random too.
+    """
+    def sample():
+        # Round the position to the nearest tenth of a meter. This keeps the sprites from jumping around while
+        # drawing due to floating point round-off to the nearest pixel.
+        return (round(rng.uniform(*TREE_X_BOUNDS), 1),
+                round(rng.uniform(0, WORLD_WIDTH), 1))
+
+    if num_trees is None:
+        tree_density = rng.gauss(TYPICAL_NUM_TREES, MAX_NUM_TREES / 3)
+        num_trees = round(min(MAX_NUM_TREES, tree_density) if tree_density >= TYPICAL_NUM_TREES
+                          else rng.triangular(0, TYPICAL_NUM_TREES, TYPICAL_NUM_TREES))
+    grid = SpacingGrid(MIN_TREE_DISTANCE)
+    for s in delivery_sites:
+        grid.add(s.position)
+    trees = [Tree(place(sample, grid, "tree"), store) for _ in range(num_trees)]
+    # Trees can overlap, so sort them so they render over each other properly.
+    trees.sort(key=lambda x: x.position[0], reverse=True)
+    return trees
+
+
+# Everything that's random about a world, as it is before anything flies through it: the entity store holding its
+# delivery sites and trees, the initial wind, and the random number generator that keeps the wind changing (None for a
+# WindTrace, which has its own).
+World = collections.namedtuple("World", ["rng", "store", "delivery_sites", "trees", "wind"])
+
+
+def stream_rng(seed, stream):
+    """ A random number generator for one of the independent streams of a seed, such as SITES_STREAM. """
+    return random.Random(np.random.SeedSequence(seed, spawn_key=(stream,)).generate_state(4).tobytes())
+
+
+def generate_world(seed=None, num_trees=None, wind_seed=None):
+    """ Generates the world for a seed, with num_trees trees if it's given instead of a random number of them.
+
+    With a wind_seed, the delivery sites and trees are drawn from streams of the seed of their own, and the wind is the
+    WindTrace of wind_seed. None of them then depends on how much the others draw: a seed has the same delivery sites
+    with any number of trees, and any world can be flown through any wind.
+    """
+    if wind_seed is not None:
+        store = EntityStore()
+        delivery_sites = generate_delivery_sites(stream_rng(seed, SITES_STREAM), store)
+        trees = generate_trees(delivery_sites, stream_rng(seed, TREES_STREAM), store, num_trees)
+        return World(None, store, delivery_sites, trees, WindTrace(wind_seed))
+
+    # Each world gets its own generator so that several simulations can be interleaved in one process. It produces the
+    # same sequence the global random module would for the same seed.
+    rng = random.Random(seed)
+    # Every entity in the world is a row of the store
+    store = EntityStore()
+    delivery_sites = generate_delivery_sites(rng, store)
+    trees = generate_trees(delivery_sites, rng, store, num_trees)
+    return World(rng, store, delivery_sites, trees, Wind(rng))
+
+
+def corridor_site_bounds(index, length):
+    """ The x bounds, along a corridor of length meters, of the delivery site of chunk index. There's no site if the
+    lower bound is higher. Keeping sites half of MIN_DELIVERY_DISTANCE from the ends of their chunk keeps them far
+    enough from each other, and from the trees of the chunks next to theirs.
+    """
+    start = index * CORRIDOR_CHUNK_LENGTH
+    return (max(start + MIN_DELIVERY_DISTANCE / 2.0, DELIVERY_SITE_X_BOUNDS[0]),
+            min(start + CORRIDOR_CHUNK_LENGTH - MIN_DELIVERY_DISTANCE / 2.0,
+                length - (WORLD_LENGTH - DELIVERY_SITE_X_BOUNDS[1])))
+
+
+def generate_corridor_chunk(seed, index, length, num_trees=None):
+    """ Generates chunk index of a corridor of length meters. Returns the positions of its delivery sites and trees,
+    along the whole corridor. Each chunk has a random number generator of its own, derived from the seed and the index,
+    so chunks come out the same whatever order they're generated in. With num_trees, the chunk has the same density
+    of trees as a world of num_trees trees.
+    """
+    rng = random.Random("{}:{}".format(seed, index))
+    start = index * CORRIDOR_CHUNK_LENGTH
+    # Chunks are far shorter than half the world, so distances within one never wrap around
+    grid = SpacingGrid(MIN_TREE_DISTANCE)
+    sites = []
+    site_min, site_max = corridor_site_bounds(index, length)
+    if site_min <= site_max:
+        sites.append((round(rng.uniform(site_min, site_max), 1),
+                      round(rng.uniform(*DELIVERY_SITE_Y_BOUNDS) % WORLD_WIDTH, 1)))
+        grid.add(sites[-1])
+
+    tree_min = max(start, TREE_X_BOUNDS[0])
+    tree_max = min(start + CORRIDOR_CHUNK_LENGTH, length - (WORLD_LENGTH - TREE_X_BOUNDS[1]))
+    if tree_min >= tree_max:
+        return sites, []
+    # The same density of trees as a whole world, scaled to the chunk
+    if num_trees is not None:
+        num_trees = round(num_trees * CORRIDOR_CHUNK_LENGTH / WORLD_LENGTH)
+    else:
+        typical_num_trees = TYPICAL_NUM_TREES * CORRIDOR_CHUNK_LENGTH / WORLD_LENGTH
+        max_num_trees = MAX_NUM_TREES * CORRIDOR_CHUNK_LENGTH / WORLD_LENGTH
+        tree_density = rng.gauss(typical_num_trees, max_num_trees / 3)
+        num_trees = round(min(max_num_trees, tree_density) if tree_density >= typical_num_trees
+                          else rng.triangular(0, typical_num_trees, typical_num_trees))
+    trees = [place(lambda: (round(rng.uniform(tree_min, tree_max), 1), round(rng.uniform(0, WORLD_WIDTH), 1)),
+                   grid, "tree") for _ in range(num_trees)]
+    return sites, trees
+
+
+class WorldBank():
+    """ Worlds generated ahead of time and saved together in one .npy file of WORLD_BANK_DTYPE records, which is
+    memory-mapped rather than read. Loading a world from a bank skips the random placement of its sites and trees, and
+    it flies exactly the same as the world generated from its seed.
+    """
+    __slots__ = ["_worlds"]
+
+    def __init__(self, path):
+        self._worlds = np.load(path, mmap_mode="r")
+        if self._worlds.dtype != WORLD_BANK_DTYPE or (len(self._worlds) and
+                                                      self._worlds["version"][0] != WORLD_BANK_VERSION):
+            raise ValueError("{} isn't a version {} world bank".format(path, WORLD_BANK_VERSION))
+
+    def __len__(self):
+        return len(self._worlds)
+
+    def seed(self, index):
+        """ The seed world index was generated from. """
+        return int(self._worlds["seed"][index])
+
+    def world(self, index, wind_seed=None):
+        """ A fresh World for world index. Every call builds a new one, since flying through a world changes it. With
+        wind_seed, the wind is the WindTrace of that seed instead of the world's own.
+        """
+        record = self._worlds[index]
+        rng = random.Random()
+        gauss_next = float(record["gauss_next"])
+        rng.setstate((random.Random.VERSION, tuple(record["rng_state"].tolist()),
+                      None if math.isnan(gauss_next) else gauss_next))
+        store = EntityStore()
+        delivery_sites = [DeliverySite(position, store) for position in record["delivery_sites"].tolist()]
+        trees = [Tree(position, store) for position in record["trees"][:record["num_trees"]].tolist()]
+        # The same order generate_trees leaves them in
+        trees.sort(key=lambda x: x.position[0], reverse=True)
+        if wind_seed is not None:
+            return World(None, store, delivery_sites, trees, WindTrace(wind_seed))
+        return World(rng, store, delivery_sites, trees, Wind(rng, *record["wind"].tolist()))
+
+    @staticmethod
+    def build(path, seeds, processes=None):
+        """ Generates the world for each seed and saves them to path as a bank, in order. The worlds are generated by
+        processes forked processes at once (by default one per CPU), see fork_map, or in this process if processes is
+        1. The file only appears once it's complete.
+        """
+        seeds = list(seeds)
+        temp_path = "{}.{}.tmp.npy".format(path, os.getpid())
+        np.lib.format.open_memmap(temp_path, mode="w+", dtype=WORLD_BANK_DTYPE, shape=(len(seeds),)).flush()
+
+        def fill(span):
+            worlds = np.load(temp_path, mmap_mode="r+")
+            for i in range(*span):
+                world = generate_world(seeds[i])
+                trees = world.store.position[world.store.rows(TREE_TAG)]
+                _, rng_state, gauss_next = world.rng.getstate()
+                worlds["version"][i] = WORLD_BANK_VERSION
+                worlds["seed"][i] = seeds[i]
+                worlds["delivery_sites"][i] = world.store.position[world.store.rows(DELIVERY_SITE_TAG)]
+                worlds["num_trees"][i] = len(trees)
+                worlds["trees"][i, :len(trees)] = trees
+                worlds["wind"][i] = (world.wind._speed, world.wind._direction)
+                worlds["rng_state"][i] = rng_state
+                worlds["gauss_next"][i] = math.nan if gauss_next is None else gauss_next
+            worlds.flush()
+
+        spans = [(first, min(first + WORLD_BANK_CHUNK, len(seeds))) for first in range(0, len(seeds), WORLD_BANK_CHUNK)]
+        try:
+            if processes == 1:
+                for span in spans:
+                    fill(span)
+            else:
+                fork_map(fill, spans, processes)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+
+# The outcome of a flight. result is None while the flight is still in progress.
+Outcome = collections.namedtuple("Outcome", ["result", "deliveries", "zipaa_violations"])
+
+
+def fork_map(function, items, processes=None):
+    """ Calls function(item) for every item, each in a child forked from this process, and returns the results in
+    order. Children see this process's memory as it was at the fork, copy-on-write, so anything set up beforehand
+    doesn't have to be rebuilt or sent to them. Results are pickled back over a pipe. At most processes children (by
+    default one per CPU) run at once. Only available where os.fork is.
+    """
+    if processes is None:
+        processes = os.cpu_count() or 1
+    elif processes < 1:
+        raise ValueError("processes must be at least 1")
+    items = list(items)
+    results = [None] * len(items)
+    running = {}
+
+    def collect():
+        # Wait on the oldest child first
+        pid = next(iter(running))
+        read_fd, index = running.pop(pid)
+        with os.fdopen(read_fd, "rb") as f:
+            data = f.read()
+        os.waitpid(pid, 0)
+        if not data:
+            raise ChildProcessError("Forked child for item {} exited without a result".format(index))
+        ok, value = pickle.loads(data)
+        if not ok:
+            raise value
+        results[index] = value
+
+    for index, item in enumerate(items):
+        if len(running) >= processes:
+            collect()
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            try:
+                try:
+                    message = pickle.dumps((True, function(item)))
+                except Exception as e:
+                    message = pickle.dumps((False, ChildProcessError("Item {} failed: {!r}".format(index, e))))
+                with os.fdopen(write_fd, "wb") as f:
+                    f.write(message)
+            finally:
+                # Skip the parent's cleanup handlers, they aren't ours to run.
+                os._exit(0)
+        os.close(write_fd)
+        running[pid] = (read_fd, index)
+    while running:
+        collect()
+    return results
+
+
+class Snapshot():
+    """ The complete state of a Simulation at one tick: the world, vehicle, wind, random number generator, dropped
+    packages and counters. Restoring it continues the flight exactly as if it had never been interrupted.
+    """
+    __slots__ = ["_state"]
+
+    def __init__(self, state):
+        self._state = copy.deepcopy(state)
+
+    @property
+    def loop_count(self):
+        return self._state["loop_count"]
+
+    def state(self):
+        """ A fresh copy of the state, so the snapshot can be restored any number of times. """
+        return copy.deepcopy(self._state)
+
+
+class Simulation():
+    """ A single flight through a randomly generated world, stepped one tick at a time.
+
+    This holds everything the simulation needs, with no dependency on a display or a pilot process, so that many
+    flights can be run back to back in one process:
+
+        sim = Simulation(seed=42)
+        telemetry = sim.telemetry()
+        while sim.result is None:
+            telemetry = sim.step(lateral_airspeed, drop_package)
+        print(sim.outcome())
+    """
+
+    def __init__(self, seed=None, dt=DT_SEC, lidar=DEFAULT_LIDAR, world=None):
+        # Coarser time steps fly faster, at the cost of a different wind and different rounding than the 60Hz default
+        self.dt = dt
+        self.lidar = lidar
+        self.reset(seed, world)
+
+    def reset(self, seed=None, world=None):
+        """ Generates a new world from the seed, or takes the given World (such as one from a WorldBank), and puts the
+        zip back at the distribution center.
+
+        Returns the first telemetry tuple.
+        """
+        if world is None:
+            world = generate_world(seed)
+        self.rng, self.store, self.delivery_sites, self.trees, self.wind = world
+        self._index_world()
+        # Set by use_lidar_table()
+        self.lidar_table = None
+
+        self._reset_flight()
+        return self.telemetry()
+
+    def _index_world(self):
+        """ Makes the lidar objects of the trees and delivery sites, and indexes them. """
+        # A list of objects that reflect lidar points
+        self.lidar_objects = ([t.make_lidar_object() for t in self.trees] +
+                              [d.make_lidar_object() for d in self.delivery_sites])
+        self.lidar_index = LidarIndex(self.store, self.store.rows(LIDAR_TAG))
+        self.collision_index = CollisionIndex(self.store, self.store.rows(TREE_TAG))
+
+    def _reset_flight(self):
+        """ Puts a new zip at the distribution center, keeping the world as it is. """
+        self.vehicle = Zip(self.store)
+        self.lateral_airspeed = 0.0
+        # Used to de-bounce commands to drop a package
+        self.was_package_dropped = False
+        # Number of packages still in the zip
+        self.num_packages = len(self.delivery_sites)
+        # List of package objects that have been dropped
+        self.dropped_packages = []
+        # To count iterations to compute the telemetry timestamp
+        self.loop_count = 0
+        # Set to an exit code when the flight is over
+        self.result = None
+
+    def sibling(self):
+        """ Another flight through the same world, starting from the distribution center.
+
+        The world (entity store, trees, delivery sites, lidar objects and table, wind and random generator) is shared
+        with this simulation rather than copied, so siblings must be advanced together with advance() and a single wind
+        update per tick, the way Fleet does it.
+        """
+        sim = Simulation.__new__(Simulation)
+        for name in ("dt", "lidar", "rng", "store", "delivery_sites", "trees", "lidar_objects", "lidar_index",
+                     "collision_index", "lidar_table", "wind"):
+            setattr(sim, name, getattr(self, name))
+        sim._reset_flight()
+        return sim
+
+    def telemetry(self):
+        """ The values for the current tick, in the order they're packed into the lidar's telemetry struct. """
+        vehicle_x, vehicle_y = self.vehicle.position
+        wind_x, wind_y = self.wind.vector
+        return (int(self.loop_count * self.dt * 1e3) & 0xFFFF,
+                round(RECOVERY_X - vehicle_x),
+                wind_x,
+                wind_y,
+                round((-vehicle_y + WORLD_WIDTH_HALF) % WORLD_WIDTH - WORLD_WIDTH_HALF),
+                *(self.lidar_index.cast((vehicle_x, vehicle_y), self.lidar) if self.lidar_table is None
+                  else self.lidar_table.cast((vehicle_x, vehicle_y))))
+
+    def use_lidar_table(self, directory, resolution=LIDAR_TABLE_RESOLUTION, processes=1):
+        """ Looks the lidar up in a LidarTable of this world from now on, instead of casting it. The table is loaded
+        from directory, or built and saved there first. Returns the table.
+        """
+        self.lidar_table = LidarTable.load(directory, self.lidar_index, self.lidar, resolution, processes)
+        return self.lidar_table
+
+    def step(self, lateral_airspeed, drop_package):
+        """ Advances the simulation by one tick of dt and returns the telemetry for the next tick.
+
+        Check result afterwards to see if the flight has ended. Stepping a finished flight is not meaningful.
+        """
+        self.advance(lateral_airspeed, drop_package)
+        self.wind.update(self.dt)
+        return self.telemetry()
+
+    def advance(self, lateral_airspeed, drop_package):
+        """ Everything step() does for the zip, without updating the wind or casting the lidar. """
+        self.loop_count += 1
+        self.lateral_airspeed = max(-30.0, min(30.0, lateral_airspeed))
+        drop_package_commanded = bool(drop_package)
+        vehicle = self.vehicle
+        dt = self.dt
+
+        velocity = vehicle.get_velocity(self.lateral_airspeed, self.wind.vector)
+        start_position = vehicle.position
+        vehicle.update(dt, self.lateral_airspeed, self.wind.vector)
+        vehicle_position = vehicle.position
+
+        # Check for collisions with trees. At the default rate the zip moves well under a tree's radius per tick, so
+        # checking where it ends up is enough. Coarser ticks check the whole path so they can't skip over a tree.
+        if dt > DT_SEC:
+            delta = (dt * velocity[0], dt * velocity[1])
+            trees = self.collision_index.rows_near(start_position[0] + 0.5 * delta[0], 0.5 * abs(delta[0]))
+            if np.count_nonzero(self.store.sweep(trees, start_position, delta)):
+                self.result = CRASHED
+        elif self.collision_index.contains(vehicle_position):
+            self.result = CRASHED
+
+        for p in self.dropped_packages:
+            p.update(dt)
+
+        # Drop a package if commanded to. The package is dropped after updating physics so that we can
+        # append it right on to the end of the dropped packages list. This adds some "realism" since a
+        # real mechanism would release the package some time after being commanded to.
+        if drop_package_commanded and not self.was_package_dropped and self.num_packages > 0:
+            self.num_packages -= 1
+            self.dropped_packages.append(Package(vehicle_position,
+                                                 velocity, store=self.store))
+
+        self.was_package_dropped = drop_package_commanded
+
+        vehicle_x, vehicle_y = vehicle_position
+        if vehicle_x >= RECOVERY_X:
+            self.result = RECOVERED if vehicle_y <= RECOVERY_Y_MIN or vehicle_y >= RECOVERY_Y_MAX else PARALANDED
+
+    def clear_ahead(self, distance):
+        """ Whether every lidar object ahead of the zip is at least distance meters ahead of it, in which case none of
+        the lidar returns can be closer than that. This is much cheaper than casting the lidar.
+        """
+        return self.lidar_index.clear_ahead(self.vehicle.position[0], distance)
+
+    def snapshot(self):
+        """ Captures the current state of the flight. """
+        return Snapshot(vars(self))
+
+    def restore(self, snapshot):
+        """ Puts the flight back in the state it was in when the snapshot was taken. """
+        vars(self).update(snapshot.state())
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """ Creates a new, independent simulation that continues from the snapshot. """
+        sim = cls.__new__(cls)
+        sim.restore(snapshot)
+        return sim
+
+    def fork(self, fly, count, processes=None):
+        """ Branches count what-if continuations from the current state of the flight. Each calls fly(sim, branch) in
+        a forked child, with its own copy of this simulation and of anything else in memory, such as an in-process
+        pilot's agent. Returns what each call of fly returned, in branch order. This simulation is left untouched.
+
+            def fly(sim, branch):
+                while sim.result is None:
+                    sim.step(lateral_airspeed=branch - 15.0, drop_package=False)
+                return sim.outcome()
+
+            outcomes = sim.fork(fly, count=31)
+        """
+        return fork_map(lambda branch: fly(self, branch), range(count), processes)
+
+    def outcome(self):
+        """ Scores the packages dropped so far as if they had all landed. """
+        # Count delivered packages, looking for double deliveries
+        package_count_by_site = {}
+        for p in self.dropped_packages:
+            landing_position = p.landing_position()
+            for s in self.delivery_sites:
+                if s.contains(landing_position):
+                    try:
+                        package_count_by_site[s] += 1
+                    except KeyError:
+                        package_count_by_site[s] = 1
+        return Outcome(self.result,
+                       len(package_count_by_site),
+                       sum((x - 1 for x in package_count_by_site.values() if x > 1)))
+
+
+class CorridorSimulation(Simulation):
+    """ A flight along a corridor of any length, generated in chunks of CORRIDOR_CHUNK_LENGTH as the zip advances, so
+    that neither memory nor the cost of a tick grows with the length of the flight.
+
+    Only a window of CORRIDOR_WINDOW_CHUNKS chunks exists at a time, laid out in the frame of an ordinary world. Once
+    the zip is past the second chunk of the window, the window moves on by a chunk: packages that have landed are
+    scored, the chunk behind is evicted, the next chunk ahead is generated, everything shifts back by a chunk, and the
+    indexes are rebuilt over the few entities left. There's a delivery site per chunk and a package per site. The
+    telemetry's recovery error saturates at what its 2 bytes can hold.
+
+    Corridors are generated as they're flown, so they can't be given a World, shared by siblings or tabled.
+    """
+
+    def __init__(self, seed=None, length=CORRIDOR_LENGTH, dt=DT_SEC, lidar=DEFAULT_LIDAR, num_trees=None,
+                 wind_seed=None):
+        self.length = length
+        # The density of trees, as the number in a world's length, or None for a random density in each chunk
+        self.num_trees = num_trees
+        # The seed of the corridor's WindTrace, or None for a Wind drawn from the seed
+        self.wind_seed = wind_seed
+        # The x, along the corridor, that the zip is recovered at
+        self.recovery_x = length - (WORLD_LENGTH - RECOVERY_X)
+        super().__init__(seed, dt, lidar)
+
+    def reset(self, seed=None, world=None):
+        """ Starts a new corridor from the seed and puts the zip back at the distribution center.
+
+        Returns the first telemetry tuple.
+        """
+        if world is not None:
+            raise ValueError("A corridor is generated as it's flown, it can't be given a World")
+        # The wind has a random number generator of its own. Chunks get theirs from chunk_seed.
+        if self.wind_seed is None:
+            self.rng = random.Random(seed)
+            self.wind = Wind(self.rng)
+        else:
+            self.rng = None
+            self.wind = WindTrace(self.wind_seed)
+        self.chunk_seed = random.getrandbits(64) if seed is None else seed
+        # The chunks in the window, by index, and the index of the first one
+        self.chunks = {}
+        self.first_chunk = 0
+        # Packages that landed before their chunk was evicted, by the index of the chunk they were delivered to
+        self.site_deliveries = collections.Counter()
+        self.store = EntityStore()
+        self._populate()
+        self.lidar_table = None
+
+        self._reset_flight()
+        num_chunks = math.ceil(self.length / CORRIDOR_CHUNK_LENGTH)
+        self.num_packages = sum(1 for site_min, site_max in (corridor_site_bounds(index, self.length)
+                                                             for index in range(num_chunks)) if site_min <= site_max)
+        return self.telemetry()
+
+    def _populate(self):
+        """ Fills the store with the chunks in the window, generating the ones that are new to it, and indexes them. """
+        origin = self.first_chunk * CORRIDOR_CHUNK_LENGTH
+        self.delivery_sites = []
+        # The chunk of each delivery site
+        self.site_chunks = []
+        self.trees = []
+        for index in range(self.first_chunk, self.first_chunk + CORRIDOR_WINDOW_CHUNKS):
+            if index not in self.chunks:
+                self.chunks[index] = generate_corridor_chunk(self.chunk_seed, index, self.length, self.num_trees)
+            sites, trees = self.chunks[index]
+            for x, y in sites:
+                self.delivery_sites.append(DeliverySite((x - origin, y), self.store))
+                self.site_chunks.append(index)
+            self.trees.extend(Tree((x - origin, y), self.store) for x, y in trees)
+        # Trees can overlap, so sort them so they render over each other properly.
+        self.trees.sort(key=lambda x: x.position[0], reverse=True)
+        self._index_world()
+
+    def _advance_window(self):
+        """ Moves the window on by a chunk. """
+        # Score the packages that have landed while their sites are still here. The rest are still falling, and too
+        # close to the zip to be in the chunk being evicted.
+        falling = []
+        for p in self.dropped_packages:
+            if p._fall_duration > 0:
+                falling.append((p.position, p._velocity, p._fall_duration))
+                continue
+            for s, index in zip(self.delivery_sites, self.site_chunks):
+                if s.contains(p.position):
+                    self.site_deliveries[index] += 1
+        del self.chunks[self.first_chunk]
+        self.first_chunk += 1
+
+        vehicle_x, vehicle_y = self.vehicle.position
+        self.store = EntityStore()
+        self._populate()
+        self.vehicle = Zip(self.store)
+        self.vehicle.position = (vehicle_x - CORRIDOR_CHUNK_LENGTH, vehicle_y)
+        self.dropped_packages = [Package((x - CORRIDOR_CHUNK_LENGTH, y), velocity, fall_duration, self.store)
+                                 for (x, y), velocity, fall_duration in falling]
+
+    def sibling(self):
+        raise ValueError("Corridors can't be shared by several zips")
+
+    def use_lidar_table(self, directory, resolution=LIDAR_TABLE_RESOLUTION, processes=1):
+        raise ValueError("Corridors are generated as they're flown, so their lidar can't be tabled")
+
+    def telemetry(self):
+        telemetry = super().telemetry()
+        recovery_error = round(self.recovery_x - self.first_chunk * CORRIDOR_CHUNK_LENGTH - self.vehicle.position[0])
+        return (telemetry[0], max(-0x8000, min(0x7FFF, recovery_error)), *telemetry[2:])
+
+    def advance(self, lateral_airspeed, drop_package):
+        super().advance(lateral_airspeed, drop_package)
+        if self.result is not None:
+            return
+        vehicle_x, vehicle_y = self.vehicle.position
+        if self.first_chunk * CORRIDOR_CHUNK_LENGTH + vehicle_x >= self.recovery_x:
+            self.result = RECOVERED if vehicle_y <= RECOVERY_Y_MIN or vehicle_y >= RECOVERY_Y_MAX else PARALANDED
+        elif vehicle_x >= 2 * CORRIDOR_CHUNK_LENGTH:
+            self._advance_window()
+
+    def outcome(self):
+        """ Scores the packages dropped so far as if they had all landed, along with the ones scored already. """
+        package_count_by_site = collections.Counter(self.site_deliveries)
+        for p in self.dropped_packages:
+            landing_position = p.landing_position()
+            for s, index in zip(self.delivery_sites, self.site_chunks):
+                if s.contains(landing_position):
+                    package_count_by_site[index] += 1
+        return Outcome(self.result,
+                       len(package_count_by_site),
+                       sum((x - 1 for x in package_count_by_site.values() if x > 1)))
+
+
+class Fleet():
+    """ Several zips flying through the same world at once, each with its own pilot and result.
+
+    The world, its lidar objects and the wind are generated once and shared. The wind doesn't depend on the zips, so
+    every flight in a fleet goes exactly the way it would have gone alone in a Simulation with the same seed.
+    """
+
+    def __init__(self, seed=None, size=1, dt=DT_SEC, lidar=DEFAULT_LIDAR, world=None, corridor_length=None,
+                 num_trees=None, wind_seed=None):
+        self.reset(seed, size, dt, lidar, world, corridor_length, num_trees, wind_seed)
+
+    def reset(self, seed=None, size=1, dt=DT_SEC, lidar=DEFAULT_LIDAR, world=None, corridor_length=None,
+              num_trees=None, wind_seed=None):
+        """ Generates a new world, with num_trees trees and the WindTrace of wind_seed if they're given, or takes the
+        given one, and lines up size zips at the distribution center. Returns their first telemetry. With
+        corridor_length, the single zip flies a CorridorSimulation instead.
+        """
+        if corridor_length is not None:
+            if size > 1:
+                raise ValueError("A corridor flies a single zip")
+            lead = CorridorSimulation(seed, corridor_length, dt, lidar, num_trees, wind_seed)
+        else:
+            if world is None and (num_trees is not None or wind_seed is not None):
+                world = generate_world(seed, num_trees, wind_seed)
+            lead = Simulation(seed, dt, lidar, world)
+        self.flights = [lead] + [lead.sibling() for _ in range(size - 1)]
+        return self.telemetry()
+
+    @property
+    def active(self):
+        """ Whether any zip is still flying. """
+        return any(f.result is None for f in self.flights)
+
+    def telemetry(self):
+        """ The telemetry of every zip that's still flying, or None for the ones that aren't. """
+        return [f.telemetry() if f.result is None else None for f in self.flights]
+
+    def step(self, commands):
+        """ Advances every zip that's still flying by one tick. commands has a (lateral_airspeed, drop_package) pair
+        for each zip, which is ignored for the ones that have finished. Returns the next telemetry.
+        """
+        self.advance(commands)
+        return self.telemetry()
+
+    def advance(self, commands):
+        """ Everything step() does, without casting the lidar. """
+        for flight, (lateral_airspeed, drop_package) in zip(self.flights, commands):
+            if flight.result is None:
+                flight.advance(lateral_airspeed, drop_package)
+        lead = self.flights[0]
+        lead.wind.update(lead.dt)
+
+    def use_lidar_table(self, directory, resolution=LIDAR_TABLE_RESOLUTION, processes=1):
+        """ Simulation.use_lidar_table for every zip, sharing one table. """
+        table = self.flights[0].use_lidar_table(directory, resolution, processes)
+        for flight in self.flights[1:]:
+            flight.lidar_table = table
+        return table
+
+    def outcomes(self):
+        return [f.outcome() for f in self.flights]
+
+
+Command = collections.namedtuple("Command", ["lateral_airspeed", "drop_package", "hold_ticks", "hold_range"])
+
+
+def unpack_command(cmd, holds=False):
+    """ Decodes a COMMAND_STRUCT message into a Command. Unless holds is set, the pilot wasn't told it may hold, so the
+    drop_package byte and the padding mean what they always have.
+    """
+    lateral_airspeed, drop_package_byte, hold_ticks, hold_range = COMMAND_STRUCT.unpack(cmd)
+    if not holds or not drop_package_byte & HOLD_COMMAND:
+        return Command(lateral_airspeed, bool(drop_package_byte), 0, 0)
+    return Command(lateral_airspeed, bool(drop_package_byte & ~HOLD_COMMAND), hold_ticks, hold_range)
+
+
+class SubprocessPilot():
+    """ A pilot running in its own process, talking the TELEMETRY_STRUCT / COMMAND_STRUCT byte protocol over pipes.
+
+    With any lidar other than the standard one, or with holds, the pilot is first sent the HANDSHAKE_STRUCT describing
+    them, and the telemetry follows in the lidar's own format. Only a pilot told it may hold can hold commands.
+    """
+    __slots__ = ["_process", "_telemetry_struct", "_holds"]
+
+    def __init__(self, command, lidar=DEFAULT_LIDAR, holds=False):
+        self._process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self._telemetry_struct = lidar.telemetry_struct
+        self._holds = holds
+        if not lidar.standard or holds:
+            self._process.stdin.write(HANDSHAKE_STRUCT.pack(*lidar.handshake(holds)))
+
+    def exchange(self, telemetry):
+        """ Sends one tick of telemetry and returns the pilot's Command, or None if the pilot process has exited. """
+        self._process.stdin.write(self._telemetry_struct.pack(*telemetry))
+        self._process.stdin.flush()
+        cmd = self._process.stdout.read(COMMAND_STRUCT.size)
+        if len(cmd) != COMMAND_STRUCT.size:
+            return None
+        return unpack_command(cmd, self._holds)
+
+    def close(self):
+        self._process.stdin.close()
+        self._process.stdout.close()
+        self._process.wait()
+
+
+class BatchSubprocessPilot(SubprocessPilot):
+    """ A pilot process that flies many worlds at once, using the batched messages. Batches only carry the standard
+    lidar.
+    """
+    __slots__ = []
+
+    def exchange_batch(self, world_ids, telemetries):
+        """ Sends the telemetry of every world in one write and returns their (lateral_airspeed, drop_package) commands
+        in the same order, or None if the pilot process has exited. Holds aren't supported in batches and are ignored.
+        """
+        self._process.stdin.write(BATCH_HEADER_STRUCT.pack(len(world_ids)) +
+                                  b"".join(BATCH_TELEMETRY_STRUCT.pack(world_id, *telemetry)
+                                           for world_id, telemetry in zip(world_ids, telemetries)))
+        self._process.stdin.flush()
+        size = BATCH_COMMAND_STRUCT.size * len(world_ids)
+        cmds = self._process.stdout.read(size)
+        if len(cmds) != size:
+            return None
+        commands = []
+        for expected_world_id, (world_id, lateral_airspeed, drop_package_byte, _, _) in zip(
+                world_ids, BATCH_COMMAND_STRUCT.iter_unpack(cmds)):
+            if world_id != expected_world_id:
+                raise ValueError("Pilot answered for world {} instead of world {}".format(world_id, expected_world_id))
+            commands.append((lateral_airspeed, bool(drop_package_byte)))
+        return commands
+
+
+class InProcessPilot():
+    """ A pilot agent (such as my_pilot.ReflexAgent) called directly in this process, skipping the pipe round trip.
+
+    Telemetry and commands are still passed through the protocol structs so the agent sees exactly the values it would
+    have received as a subprocess, e.g. the wind and lateral airspeed rounded to 32 bit floats. With any lidar other
+    than the standard one, the agent's handshake() is first called with the fields of the HANDSHAKE_STRUCT, and agents
+    without one are rejected, since they can only read the standard lidar's telemetry. Agents can always hold, since
+    they have to return a longer tuple from getAction() to do it.
+    """
+    __slots__ = ["_agent", "_telemetry_struct"]
+
+    def __init__(self, agent, lidar=DEFAULT_LIDAR):
+        self._agent = agent
+        self._telemetry_struct = lidar.telemetry_struct
+        if not lidar.standard:
+            if not hasattr(agent, "handshake"):
+                raise ValueError("{} has no handshake() method, so it only supports the default lidar".format(
+                    type(agent).__name__))
+            agent.handshake(*HANDSHAKE_STRUCT.unpack(HANDSHAKE_STRUCT.pack(*lidar.handshake(holds=True))))
+
+    @classmethod
+    def from_spec(cls, spec, lidar=DEFAULT_LIDAR):
+        """ Creates a pilot from a "module:ClassName" string, such as "my_pilot:ReflexAgent". """
+        module_name, _, class_name = spec.partition(":")
+        if not module_name or not class_name:
+            raise ValueError("Expected a pilot module in the form module:ClassName, got {!r}".format(spec))
+        return cls(getattr(importlib.import_module(module_name), class_name)(), lidar)
+
+    def exchange(self, telemetry):
+        """ Like SubprocessPilot.exchange. The agent's getAction() returns (lateral_airspeed, drop_package), or
+        (lateral_airspeed, drop_package, hold_ticks, hold_range) to hold the command.
+        """
+        if not self._agent.update(self._telemetry_struct.unpack(self._telemetry_struct.pack(*telemetry))):
+            return None
+        lateral_airspeed, drop_package, *hold = self._agent.getAction()
+        hold_ticks, hold_range = hold or (0, 0)
+        drop_package_byte = int(drop_package) | (HOLD_COMMAND if hold else 0)
+        return unpack_command(COMMAND_STRUCT.pack(lateral_airspeed, drop_package_byte, hold_ticks, hold_range), True)
+
+    def close(self):
+        pass
+
+
+def fly(seed, pilot, dt=DT_SEC, lidar=DEFAULT_LIDAR, lidar_table_dir=None,
+        lidar_table_resolution=LIDAR_TABLE_RESOLUTION, world_bank=None, corridor_length=None, num_trees=None,
+        wind_seed=None):
+    """ Flies one headless flight with the pilot, honoring its holds, and returns the Outcome. The pilot is closed
+    afterwards. With lidar_table_dir, the lidar is looked up in a LidarTable kept there. With world_bank, seed is the
+    index of the world to fly in the WorldBank. With corridor_length, the flight is a CorridorSimulation. With
+    num_trees, the world has that many trees (or that density of them, for a corridor). With wind_seed, the wind is the
+    WindTrace of that seed, see generate_world().
+    """
+    if world_bank is not None:
+        sim = Simulation(dt=dt, lidar=lidar, world=world_bank.world(seed, wind_seed))
+    elif corridor_length is not None:
+        sim = CorridorSimulation(seed, corridor_length, dt, lidar, num_trees, wind_seed)
+    else:
+        sim = Simulation(dt=dt, lidar=lidar, world=generate_world(seed, num_trees, wind_seed))
+    if lidar_table_dir is not None:
+        sim.use_lidar_table(lidar_table_dir, lidar_table_resolution)
+    command = None
+    hold = 0
+    while sim.result is None:
+        if hold > 0 and (not command.hold_range or sim.clear_ahead(command.hold_range)):
+            hold -= 1
+        else:
+            command = pilot.exchange(sim.telemetry())
+            if command is None:
+                sim.result = CRASHED  # The pilot must have exited
+                break
+            hold = command.hold_ticks
+        sim.advance(command.lateral_airspeed, command.drop_package)
+        sim.wind.update(sim.dt)
+    pilot.close()
+    return sim.outcome()
+
+
+def fly_many(seeds, pilot_module, dt=DT_SEC, processes=None, lidar=DEFAULT_LIDAR, lidar_table_dir=None,
+             lidar_table_resolution=LIDAR_TABLE_RESOLUTION, world_bank=None, corridor_length=None, num_trees=None,
+             wind_seeds=None):
+    """ Flies a headless flight for each seed (or world index, with world_bank) with an in-process pilot given as
+    "module:ClassName", and returns their Outcomes in order. With wind_seeds, each flight's wind is the WindTrace of the
+    wind seed paired with its seed.
+
+    The pilot module is imported once, here, and every flight runs in a child forked from this warm process, so no
+    flight pays for starting an interpreter or importing anything. Each flight still gets a fresh pilot in a process of
+    its own, so pilots can't leak state from one flight into the next.
+    """
+    InProcessPilot.from_spec(pilot_module, lidar)  # Import the module and fail early if it's wrong
+    if wind_seeds is None:
+        wind_seeds = itertools.repeat(None)
+    return fork_map(lambda seeds: fly(seeds[0], InProcessPilot.from_spec(pilot_module, lidar), dt, lidar,
+                                      lidar_table_dir, lidar_table_resolution, world_bank, corridor_length, num_trees,
+                                      seeds[1]), zip(seeds, wind_seeds), processes)
 
 
 if __name__ == "__main__":
 
     parser = argparse.ArgumentParser(description='"8-bit" Zip Sim')
     parser.add_argument('pilot', nargs=argparse.REMAINDER, help='A pilot process to run')
+    parser.add_argument('--pilot-module', metavar="MODULE:CLASS", action="append", default=[],
+                        help='Run a pilot agent class in-process instead of as a subprocess, e.g. '
+                             'my_pilot:ReflexAgent. Can be repeated to fly a fleet')
+    parser.add_argument('--fleet-pilot', metavar="COMMAND", action="append", default=[],
+                        help='Another pilot process, flying its own zip through the same world, e.g. '
+                             '"python my_pilot.py -a Native". Can be repeated')
+    parser.add_argument('--pilot-holds', action="store_true",
+                        help='Let pilot processes hold commands. They are sent a handshake with HANDSHAKE_HOLDS set '
+                             'first, so only use this with pilots that read it')
     parser.add_argument('--headless', action="store_true", help='Run without visualization')
     visualizer_group = parser.add_argument_group("Visualization options")
     visualizer_group.add_argument('--chase-y', action="store_true", help='Have the camera follow the zip in the y axis')
     visualizer_group.add_argument('--show-lidar', action="store_true", help='Shows lidar in the visualization')
     visualizer_group.add_argument('--start-paused', action="store_true", help='Start the simulation paused')
     parser.add_argument('--seed', type=int, help='Seed to use for random number generation')
+    parser.add_argument('--count', type=int,
+                        help='Fly this many headless flights with the --pilot-module pilot, each in a process forked '
+                             'from this one, and print a summary. Seeds start from --seed if given')
+    parser.add_argument('--processes', type=int,
+                        help='How many --count flights to run at once. Defaults to one per CPU')
+    parser.add_argument('--dt', type=float, default=DT_SEC,
+                        help='Seconds per tick. Coarser ticks, e.g. 0.05, run faster for screening seeds, but the '
+                             'flight differs from the default. Collisions are checked along the whole path')
+    lidar_group = parser.add_argument_group("Lidar options",
+                                            "Any lidar other than the default sends pilots a handshake describing the "
+                                            "telemetry format first, see HANDSHAKE_STRUCT")
+    lidar_group.add_argument('--lidar-beams', type=int, default=LIDAR_BEAMS,
+                             help='Number of lidar beams. Defaults to %(default)s')
+    lidar_group.add_argument('--lidar-fov', type=float, default=LIDAR_FOV_DEG,
+                             help='Lidar field of view in degrees, centered straight ahead. Defaults to %(default)s')
+    lidar_group.add_argument('--lidar-decimeters', action="store_true",
+                             help='Report lidar ranges as 16 bit tenths of a meter instead of 8 bit meters')
+    lidar_group.add_argument('--lidar-table', metavar="DIR",
+                             help='Look the lidar up in a table of each world precomputed on a grid, kept in DIR and '
+                                  'built there the first time a world is flown. Much faster for flying the same seeds '
+                                  'again, but the ranges are those at the nearest grid point')
+    lidar_group.add_argument('--lidar-table-resolution', type=float, default=LIDAR_TABLE_RESOLUTION,
+                             help='Grid spacing of --lidar-table in meters. Defaults to %(default)s')
+    world_group = parser.add_argument_group("World bank options")
+    world_group.add_argument('--build-world-bank', metavar="FILE",
+                             help='Generate the worlds for --count seeds, starting from --seed or 0, into a world bank '
+                                  'FILE, in parallel, and exit')
+    world_group.add_argument('--world-bank', metavar="FILE",
+                             help='Load worlds from a world bank FILE instead of generating them from seeds')
+    world_group.add_argument('--world-index', type=int, default=0,
+                             help='The world to fly from --world-bank, or the first of the --count worlds. Defaults to '
+                                  '%(default)s')
+    parser.add_argument('--trees', type=int, metavar="N",
+                        help='Generate exactly N trees instead of a random number of them, e.g. 20000 to stress the '
+                             'simulation with a dense forest. With --corridor-length, the same density of them')
+    parser.add_argument('--wind-seed', type=int, metavar="N",
+                        help='Draw the delivery sites, trees and wind from independent random streams, with the wind '
+                             'generated ahead of time from seed N (N+1 for the next --count flight, and so on), so '
+                             'the same wind can blow through any world and any number of trees')
+    parser.add_argument('--corridor-length', type=float, metavar="METERS",
+                        help='Fly a corridor of this length instead of the usual world, generated a chunk at a time as '
+                             'the zip goes, e.g. 200000 to soak-test a pilot. Memory and time per tick stay the same '
+                             'however long it is')
     args = parser.parse_args()
 
-    random.seed(args.seed)
-    headless = args.headless
-    api_mode = len(args.pilot) > 0
+    if not 0.0 < args.dt <= PACKAGE_FALL_SEC:
+        parser.error("--dt must be more than 0 and at most {}".format(PACKAGE_FALL_SEC))
+    try:
+        lidar = Lidar(args.lidar_beams, args.lidar_fov, args.lidar_decimeters)
+    except ValueError as e:
+        parser.error(str(e))
+    if not 0.0 < args.lidar_table_resolution <= WORLD_WIDTH:
+        parser.error("--lidar-table-resolution must be more than 0 and at most {}".format(WORLD_WIDTH))
+    if args.processes is not None and args.processes < 1:
+        parser.error("--processes must be at least 1")
+    if args.wind_seed is not None and (args.wind_seed < 0 or (args.seed is not None and args.seed < 0)):
+        parser.error("--wind-seed can't be negative, and neither can --seed with it")
+
+    if args.build_world_bank:
+        if args.count is None:
+            parser.error("--build-world-bank needs --count")
+        start = time.perf_counter()
+        first_seed = args.seed or 0
+        WorldBank.build(args.build_world_bank, range(first_seed, first_seed + args.count), args.processes)
+        print("{} worlds in {:.1f}s".format(args.count, time.perf_counter() - start))
+        sys.exit(0)
+
+    world_bank = None
+    if args.world_bank:
+        if args.seed is not None:
+            parser.error("--seed can't be used with --world-bank, pick worlds with --world-index")
+        try:
+            world_bank = WorldBank(args.world_bank)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+        if not 0 <= args.world_index <= len(world_bank) - (args.count or 1):
+            parser.error("{} only has {} worlds".format(args.world_bank, len(world_bank)))
+
+    if args.pilot and args.pilot_module:
+        parser.error("a pilot process and --pilot-module can't be used together")
+
+    if args.trees is not None:
+        if args.trees < 0:
+            parser.error("--trees can't be negative")
+        if args.world_bank:
+            parser.error("--trees can't be used with --world-bank, whose worlds already have their trees")
+
+    if args.corridor_length is not None:
+        if args.corridor_length <= 0.0:
+            parser.error("--corridor-length must be more than 0")
+        if args.world_bank or args.lidar_table:
+            parser.error("--corridor-length can't be used with --world-bank or --lidar-table")
+        if len(args.pilot_module) + bool(args.pilot) + len(args.fleet_pilot) > 1:
+            parser.error("--corridor-length flies a single zip")
+
+    if args.count is not None:
+        if len(args.pilot_module) != 1 or args.pilot or args.fleet_pilot:
+            parser.error("--count needs exactly one --pilot-module and no other pilots")
+        start = time.perf_counter()
+        if world_bank is not None:
+            seeds = range(args.world_index, args.world_index + args.count)
+        else:
+            seeds = [None] * args.count if args.seed is None else range(args.seed, args.seed + args.count)
+        try:
+            outcomes = fly_many(seeds, args.pilot_module[0], args.dt, args.processes, lidar, args.lidar_table,
+                                args.lidar_table_resolution, world_bank, args.corridor_length, args.trees,
+                                None if args.wind_seed is None else range(args.wind_seed, args.wind_seed + args.count))
+        except (ValueError, ImportError, AttributeError) as e:
+            parser.error(str(e))
+        elapsed = time.perf_counter() - start
+        for name, code in (("Recovered", RECOVERED), ("Paralanded", PARALANDED), ("Crashed", CRASHED)):
+            print("{}: {}".format(name, sum(1 for o in outcomes if o.result == code)))
+        print("Deliveries: {}".format(sum(o.deliveries for o in outcomes)))
+        print("ZIPAA Violations: {}".format(sum(o.zipaa_violations for o in outcomes)))
+        print("{:.1f} flights/s".format(args.count / elapsed))
+        sys.exit(max((o.result for o in outcomes), default=RECOVERED))
 
-    if api_mode:
-        pilot = subprocess.Popen(args.pilot, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
-        loop_count = 0  # To count iterations to compute the telemetry timestamp
+    headless = args.headless
+    pilots = []
+    for spec in args.pilot_module:
+        try:
+            pilots.append(InProcessPilot.from_spec(spec, lidar))
+        except (ValueError, ImportError, AttributeError) as e:
+            parser.error(str(e))
+    if args.pilot:
+        pilots.append(SubprocessPilot(args.pilot, lidar, args.pilot_holds))
+    pilots.extend(SubprocessPilot(shlex.split(command), lidar, args.pilot_holds) for command in args.fleet_pilot)
+    api_mode = len(pilots) > 0
 
     if not headless:
+        import pygame
         pygame.init()
         pygame.display.set_caption("Zip Sim")
         screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
@@ -341,111 +1965,68 @@ if __name__ == "__main__":
         visualizer_paused = args.start_paused
         visualizer_rate_index = INITIAL_VISUALIZER_RATE_INDEX
 
-    # Randomly generate delivery sites that aren't too close to each other.
-    delivery_sites = []
-    for _ in range(NUM_DELIVERY_SITES):
-        while True:
-            # Round the position to the nearest tenth of a meter. This keeps the sprites from jumping around while
-            # drawing due to floating point round-off to the nearest pixel.
-            site_pos = (round(random.uniform(*DELIVERY_SITE_X_BOUNDS) % WORLD_LENGTH, 1),
-                        round(random.uniform(*DELIVERY_SITE_Y_BOUNDS) % WORLD_WIDTH, 1))
-            if min((s.distance_to(site_pos) for s in delivery_sites),
-                   default=MIN_DELIVERY_DISTANCE) >= MIN_DELIVERY_DISTANCE:
-                delivery_sites.append(DeliverySite(site_pos))
-                break
-
-    # Randomly generate trees that aren't too close to delivery sites.
-    trees = []
-    tree_density = random.gauss(TYPICAL_NUM_TREES, MAX_NUM_TREES / 3)
-    num_trees = round(min(MAX_NUM_TREES, tree_density) if tree_density >= TYPICAL_NUM_TREES
-                      else random.triangular(0, TYPICAL_NUM_TREES, TYPICAL_NUM_TREES))
-    for _ in range(num_trees):
-        while True:
-            # Round the position to the nearest tenth of a meter. This keeps the sprites from jumping around while
-            # drawing due to floating point round-off to the nearest pixel.
-            tree_pos = (round(random.uniform(*TREE_X_BOUNDS), 1),
-                        round(random.uniform(0, WORLD_WIDTH), 1))
-            if min((s.distance_to(tree_pos) for s in delivery_sites), default=MIN_TREE_DISTANCE) >= MIN_TREE_DISTANCE:
-                trees.append(Tree(tree_pos))
-                break
-    # Trees can overlap, so sort them so they render over each other properly.
-    trees.sort(key=lambda x: x.position[0], reverse=True)
-
-    # A list of objects that reflect lidar points
-    lidar_objects = [t.make_lidar_object() for t in trees] + [d.make_lidar_object() for d in delivery_sites]
-
-    vehicle = Zip()
-
-    # Set to an exit code when it's time to leave the main loop
-    result = None
-
-    wind = Wind()
+    dt = args.dt
+    fleet = Fleet(args.seed, max(1, len(pilots)), dt, lidar,
+                  None if world_bank is None else world_bank.world(args.world_index, args.wind_seed),
+                  args.corridor_length, args.trees, args.wind_seed)
+    if args.lidar_table:
+        fleet.use_lidar_table(args.lidar_table, args.lidar_table_resolution, args.processes)
+    flights = fleet.flights
+    telemetry = fleet.telemetry()
     lateral_airspeed = 0.0
-    # Used to de-bounce commands to drop a package
-    was_package_dropped = False
-    # Number of packages still in the zip
-    num_packages = len(delivery_sites)
-    # List of package objects that have been dropped
-    dropped_packages = []
-
-    while result is None:
-        drop_package_commanded = False
+    # The command each zip is holding and the number of ticks left to hold it, see HOLD_COMMAND
+    holds = [None] * len(flights)
+
+    while fleet.active:
+        commands = [(0.0, False)] * len(flights)
         if api_mode:
-            lidar_samples = cast_lidar(vehicle.position, lidar_objects)
-            pilot.stdin.write(TELEMETRY_STRUCT.pack(int(loop_count * DT_SEC * 1e3) & 0xFFFF,
-                                                    round(RECOVERY_X - vehicle.position[0]),
-                                                    wind.vector[0],
-                                                    wind.vector[1],
-                                                    round((-vehicle.position[1] + WORLD_WIDTH_HALF) % WORLD_WIDTH -
-                                                          WORLD_WIDTH_HALF),
-                                                    *lidar_samples))
-            pilot.stdin.flush()
-            loop_count += 1
-            cmd = pilot.stdout.read(COMMAND_STRUCT.size)
-            if len(cmd) != COMMAND_STRUCT.size:
-                result = CRASHED  # The pilot process must have exited
+            for i, (flight, pilot) in enumerate(zip(flights, pilots)):
+                if flight.result is not None:
+                    continue
+                if holds[i] is not None:
+                    command, ticks = holds[i]
+                    holds[i] = (command, ticks - 1) if ticks > 1 else None
+                    commands[i] = command[:2]
+                    continue
+                command = pilot.exchange(telemetry[i])
+                if command is None:
+                    flight.result = CRASHED  # The pilot must have exited
+                    continue
+                commands[i] = command[:2]
+                if command.hold_ticks > 0:
+                    holds[i] = (command, command.hold_ticks)
+            if not fleet.active:
                 break
-            lateral_airspeed_input, drop_package_commanded_byte, _ = COMMAND_STRUCT.unpack(cmd)
-            lateral_airspeed = max(-30.0, min(30.0, lateral_airspeed_input))
-            drop_package_commanded = bool(drop_package_commanded_byte)
         elif not headless:
+            drop_package_commanded = False
             keys = pygame.key.get_pressed()
-            lateral_airspeed -= lateral_airspeed / 0.5 * DT_SEC
+            lateral_airspeed -= lateral_airspeed / 0.5 * dt
             if keys[pygame.K_LEFT]:
-                lateral_airspeed = min(30.0, lateral_airspeed + DT_SEC * 200.0)
+                lateral_airspeed = min(30.0, lateral_airspeed + dt * 200.0)
             if keys[pygame.K_RIGHT]:
-                lateral_airspeed = max(-30.0, lateral_airspeed - DT_SEC * 200.0)
+                lateral_airspeed = max(-30.0, lateral_airspeed - dt * 200.0)
             if keys[pygame.K_SPACE]:
                 drop_package_commanded = True
-
-        vehicle.update(DT_SEC, lateral_airspeed, wind.vector)
-
-        # Check for collisions with trees
-        for t in trees:
-            if t.contains(vehicle.position):
-                result = CRASHED
-                break
-
-        for p in dropped_packages:
-            p.update(DT_SEC)
-
-        # Drop a package if commanded to. The package is dropped after updating physics so that we can
-        # append it right on to the end of the dropped packages list. This adds some "realism" since a
-        # real mechanism would release the package some time after being commanded to.
-        if drop_package_commanded and not was_package_dropped and num_packages > 0:
-            num_packages -= 1
-            dropped_packages.append(Package(vehicle.position, vehicle.get_velocity(lateral_airspeed, wind.vector)))
-
-        was_package_dropped = drop_package_commanded
-
-        wind.update(DT_SEC)
-
-        vehicle_x, vehicle_y = vehicle.position
-        if vehicle_x >= RECOVERY_X:
-            result = RECOVERED if vehicle_y <= RECOVERY_Y_MIN or vehicle_y >= RECOVERY_Y_MAX else PARALANDED
+            commands[0] = (lateral_airspeed, drop_package_commanded)
+
+        fleet.advance(commands)
+        # Zips holding a command skip the lidar until the pilot needs to see it again
+        for i, flight in enumerate(flights):
+            if holds[i] is not None and (flight.result is not None or
+                                         (holds[i][0].hold_range and not flight.clear_ahead(holds[i][0].hold_range))):
+                holds[i] = None
+        telemetry = [None if f.result is not None or hold is not None else f.telemetry()
+                     for f, hold in zip(flights, holds)]
+
+        if not fleet.active and all(f.result in (RECOVERED, PARALANDED) for f in flights):
             break
 
         if not headless:
+            # The camera, lidar and reticle follow the first zip that's still flying
+            lead = next((i for i, f in enumerate(flights) if f.result is None), 0)
+            sim = flights[lead]
+            vehicle = sim.vehicle
+            wind = sim.wind
             # Update the camera to be fixed above the vehicle in the x axis.
             camera.position = (vehicle.position[0] + CAMERA_AHEAD_M, vehicle.position[1] if chase_y else 0.0)
 
@@ -454,29 +2035,30 @@ if __name__ == "__main__":
             for pos in camera.project((0, 0)):
                 screen.blit(distribution_center_image, (pos[0] - 250, pos[1] - 100))
 
-            for t in trees:
+            for t in sim.trees:
                 t.draw(camera, screen)
-            for s in delivery_sites:
+            for s in sim.delivery_sites:
                 s.draw(camera, screen)
-            for p in dropped_packages:
-                p.draw(camera, screen)
-
-            if show_lidar:
-                # We could try to be clever and avoid casting the lidar twice if in API mode, but there's no real need
-                # since we have plenty of CPU cycles when running in real-time.
-                lidar_samples = cast_lidar(vehicle.position, lidar_objects)
-                for angle, d in zip(LIDAR_ANGLES, lidar_samples):
-                    x = d * math.cos(angle)
-                    y = d * math.sin(angle)
+            for f in flights:
+                for p in f.dropped_packages:
+                    p.draw(camera, screen)
+
+            if show_lidar and sim.result is None:
+                # The telemetry for the next tick was cast from where the vehicle is now, so reuse its lidar samples.
+                lidar_samples = (telemetry[lead] or sim.telemetry())[5:]
+                for angle, d in zip(lidar.angles, lidar_samples):
+                    x = d / lidar.units_per_meter * math.cos(angle)
+                    y = d / lidar.units_per_meter * math.sin(angle)
                     for pos in camera.project(vehicle.position):
                         pygame.draw.line(screen, "red", pos, (round(pos[0] - camera.scale(y)),
                                                               round(pos[1] - camera.scale(x))))
 
-            vehicle.draw(camera, screen)
+            for f in flights:
+                f.vehicle.draw(camera, screen)
 
             # Compute where a package would drop and draw a reticle there
             reticle = Entity(vehicle.position)
-            reticle.move((v * PACKAGE_FALL_SEC for v in vehicle.get_velocity(lateral_airspeed, wind.vector)))
+            reticle.move((v * PACKAGE_FALL_SEC for v in vehicle.get_velocity(sim.lateral_airspeed, wind.vector)))
             for pos in camera.project(reticle.position):
                 screen.blit(reticle_image, (pos[0] - 8, pos[1] - 8))
 
@@ -488,7 +2070,9 @@ if __name__ == "__main__":
             while wait_for_step:
                 for e in pygame.event.get():
                     if e.type == pygame.QUIT or (e.type == pygame.KEYDOWN and e.key == pygame.K_ESCAPE):
-                        result = SIM_QUIT
+                        for f in flights:
+                            if f.result is None:
+                                f.result = SIM_QUIT
                         wait_for_step = False
                         break
                     if e.type in [pygame.KEYDOWN]:
@@ -508,28 +2092,20 @@ if __name__ == "__main__":
                     if visualizer_paused:
                         clock.tick(PAUSED_RATE)
                     else:
-                        clock.tick(VISUALIZER_RATES[visualizer_rate_index])
+                        clock.tick(VISUALIZER_RATES[visualizer_rate_index] * DT_SEC / dt)
                         wait_for_step = False
 
     if not headless:
         pygame.quit()
 
-    # Count delivered packages, looking for double deliveries
-    package_count_by_site = {}
-    for p in dropped_packages:
-        # Make sure the package is at rest
-        p.update(PACKAGE_FALL_SEC)
-        for s in delivery_sites:
-            if s.contains(p.position):
-                try:
-                    package_count_by_site[s] += 1
-                except KeyError:
-                    package_count_by_site[s] = 1
-
-    if api_mode:
-        pilot.stdin.close()
-        pilot.stdout.close()
-        pilot.wait()
-    print("Deliveries: {}".format(len(package_count_by_site)))
-    print("ZIPAA Violations: {}".format(sum((x - 1 for x in package_count_by_site.values() if x > 1))))
-    sys.exit(result)
+    for pilot in pilots:
+        pilot.close()
+    outcomes = fleet.outcomes()
+    if len(outcomes) > 1:
+        for i, outcome in enumerate(outcomes):
+            print("Zip {}: Result: {} Deliveries: {} ZIPAA Violations: {}".format(
+                i, outcome.result, outcome.deliveries, outcome.zipaa_violations))
+    print("Deliveries: {}".format(sum(o.deliveries for o in outcomes)))
+    print("ZIPAA Violations: {}".format(sum(o.zipaa_violations for o in outcomes)))
+    # The worst result in the fleet decides the exit code
+    sys.exit(max(o.result for o in outcomes))